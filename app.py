@@ -1,74 +1,458 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory
-import os, random
-from character_generator import QUESTIONS, init_stats, synthesize, STAT_KEYS
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response, abort, get_template_attribute
+import hashlib, json, os, random
+from character_generator import (CLASSES, RACE_SUGGESTIONS, RNG_MODES, START_STATE, character_id,
+                                 parse_character_id, synthesize, unpack_stats)
+
+try:
+    from predictor import ClassPredictor
+    import party
+except ImportError:  # numpy missing: no live odds or party mode
+    ClassPredictor = party = None
+from forge_cache import CharacterCache
+import banks
+from assets import load_assets
+import export
+import bundle
+from gallery import Gallery
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.secret_key = os.environ.get("FORGE_SECRET_KEY", os.urandom(24))
 
+# Latency histograms on /metrics (see metrics.py); off unless asked for
+if os.environ.get("FORGE_METRICS") == "1":
+    import metrics
+    metrics.instrument(app)
+
+# Static files: hashed and compressed once at startup; templates link to
+# the fingerprinted names, which are safe to cache forever
+ASSETS = load_assets(app.static_folder)
+
+# Precomputed odds and scoring tables in one memory-mapped file shared by
+# all workers (see shared_tables.py); built by the first worker to need it
+tables = None
+if ClassPredictor is not None and os.environ.get("FORGE_TABLES"):
+    import shared_tables
+    tables = shared_tables.load_or_build(os.environ["FORGE_TABLES"])
+    shared_tables.install(tables)
+
+# Live "likely class" odds on the quiz page; warming precomputes the first
+# questions so no visitor pays for a cold lookup there
+predictor = None
+if ClassPredictor is not None and os.environ.get("FORGE_PREDICTIONS", "1") == "1":
+    predictor = ClassPredictor(maxsize=int(os.environ.get("FORGE_PREDICTION_CACHE", 50_000)),
+                               tables=tables)
+    if os.environ.get("FORGE_WARM_PREDICTIONS", "1") == "1":
+        predictor.warm()
+
+# Opt-in memoization of characters and result pages (see forge_cache.CharacterCache)
+character_cache = None
+if os.environ.get("FORGE_CACHE") == "1":
+    ttl = os.environ.get("FORGE_CACHE_TTL")
+    character_cache = CharacterCache(maxsize=int(os.environ.get("FORGE_CACHE_SIZE", 4096)),
+                                     ttl=float(ttl) if ttl else None)
+
+# Opt-in SQLite gallery of finished runs (see gallery.py)
+gallery = Gallery(os.environ["FORGE_GALLERY"]) if os.environ.get("FORGE_GALLERY") else None
+
 
 # Helpers
-def get_stats():
-    if "stats" not in session:
-        session["stats"] = init_stats()
-    return session["stats"]
+# The session holds just the quiz state ID (see character_generator.next_state)
+# and the seed the result will be forged with
+def get_state():
+    return session.setdefault("state", START_STATE)
+
+def get_seed():
+    return session.setdefault("seed", random.randint(0, 2**30))
+
+# Question banks (see banks.py): picked with /?bank=<name>, kept in the
+# session by name; no name means the built-in questions
+def get_bank(name):
+    try:
+        return banks.get_bank(name)
+    except KeyError:
+        abort(404)
+    except ValueError as e:  # a broken source with no good version to fall back on
+        abort(404, description=f"question bank {name!r} can't be loaded: {e}")
 
-def save_stats(stats):
-    session["stats"] = stats
+def session_bank():
+    return get_bank(session.get("bank"))
+
+def forge(stats, seed, bank=banks.BUILTIN):
+    if character_cache:
+        return character_cache.synthesize(stats, seed, bank)
+    return synthesize(stats, seed=seed, bank=bank)
 
 @app.route("/")
 def index():
     # Reset session for a new run
     session.clear()
+    name = request.args.get("bank")
+    if name and name != banks.DEFAULT:
+        get_bank(name)
+        session["bank"] = name
     return render_template("index.html")
 
 @app.route("/quiz/<int:qid>", methods=["GET", "POST"])
 def quiz(qid):
-    # qid is 0-based index for QUESTIONS
-    if qid < 0 or qid >= len(QUESTIONS):
+    # qid is 0-based index for the bank's questions
+    bank = session_bank()
+    if qid < 0 or qid >= len(bank.questions):
         return redirect(url_for("index"))
-    stats = get_stats()
-    q = QUESTIONS[qid]
+    state = get_state()
+    q = bank.questions[qid]
     if request.method == "POST":
         choice = request.form.get("choice")
         if choice in q["opts"]:
-            _, delta = q["opts"][choice]
-            # Apply deltas to stats
-            for k, v in delta.items():
-                stats[k] = stats.get(k, 0) + v
-            # clamp small sanity bounds (same as in generator)
-            for k in stats:
-                if stats[k] < -10: stats[k] = -10
-                if stats[k] > 100: stats[k] = 100
-            save_stats(stats)
+            session["state"] = bank.next_state(state, qid, choice)
             next_q = qid + 1
-            if next_q >= len(QUESTIONS):
+            if next_q >= len(bank.questions):
                 return redirect(url_for("result"))
             else:
                 return redirect(url_for("quiz", qid=next_q))
-    # Render question page
-    # Provide fingerprint for progress bar (1-indexed)
-    progress = {"current": qid+1, "total": len(QUESTIONS)}
-    return render_template("quiz.html", question=q, qid=qid, progress=progress)
+    # The predictor only knows the built-in questions
+    likely = predictor.top(qid, unpack_stats(state)) if predictor and bank is banks.BUILTIN else []
+    return quiz_page(bank, qid, likely)
+
+# Question pages only differ in the question and the live odds: each one
+# is rendered once per bank version, on first use, and the odds are
+# spliced in per request
+LIKELY_SLOT = "<!--likely-->"
+_quiz_pages = {}  # (bank name, bank version, qid) -> (head, tail, etag)
+
+def quiz_page(bank, qid, likely):
+    key = (bank.name, bank.version, qid)
+    page = _quiz_pages.get(key)
+    if page is None:
+        # Provide fingerprint for progress bar (1-indexed)
+        progress = {"current": qid+1, "total": len(bank.questions)}
+        html = render_template("quiz.html", question=bank.questions[qid], qid=qid, progress=progress,
+                               bundle_url=bundle_url(bank))
+        head, _, tail = html.encode("utf-8").partition(LIKELY_SLOT.encode())
+        page = _quiz_pages[key] = (head, tail, hashlib.sha1(head + tail).hexdigest()[:12])
+    head, tail, etag = page
+    odds = b""
+    if likely:
+        odds = str(get_template_attribute("likely.html", "likely_odds")(likely)).encode("utf-8")
+        etag += "-" + hashlib.sha1(odds).hexdigest()[:8]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(head + odds + tail)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+# The client-side quiz (see bundle.py and static/js/script.js): the page
+# fetches the bank's rule bundle under its immutable, versioned URL and
+# posts the finished answers to /quiz/finish
+_bundles = {}  # (bank name, bank version) -> (bundle version, bytes)
+
+def quiz_bundle_for(bank):
+    key = (bank.name, bank.version)
+    if key not in _bundles:
+        _bundles[key] = bundle.bundle_bytes(bank)
+    return _bundles[key]
+
+# Rules with more features than the browser's 32-bit masks hold (tuned ones
+# can get there) have no bundle: the page leaves out data-bundle and the
+# quiz runs through the server
+def bundle_url(bank):
+    try:
+        version = quiz_bundle_for(bank)[0]
+    except ValueError:
+        return None
+    if bank is banks.BUILTIN:
+        return url_for("quiz_bundle", version=version)
+    return url_for("quiz_bundle", version=version, bank=bank.name)
+
+@app.route("/bundle/<version>.json")
+def quiz_bundle(version):
+    try:
+        current, body = quiz_bundle_for(get_bank(request.args.get("bank")))
+    except ValueError:
+        abort(404)
+    if version != current:
+        abort(410)  # an older bundle; the quiz page links to the current one
+    if request.if_none_match.contains(version):
+        return permanent(Response(status=304), version)
+    return permanent(Response(body, mimetype="application/json"), version)
+
+@app.route("/quiz/finish", methods=["POST"])
+def quiz_finish():
+    # The whole run at once; "state" is what the client computed, checked here
+    bank = session_bank()
+    try:
+        state = bank.answers_state(request.form.get("answers", ""))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    claimed = request.form.get("state", type=int)
+    if claimed is not None and claimed != state:
+        return jsonify({"error": "the submitted state doesn't match the answers"}), 409
+    session["state"] = state
+    return redirect(url_for("result"))
+
+@banks.on_reload
+def evict_bank(name, old_version):
+    # Drop the pages, bundles and characters built from a bank's previous version
+    for key in [key for key in _quiz_pages if key[0] == name]:
+        _quiz_pages.pop(key, None)
+    _bundles.pop((name, old_version), None)
+    if character_cache:
+        character_cache.evict(name, old_version)
 
 @app.route("/result")
 def result():
-    stats = get_stats()
-    # Convert keys to ensure deterministic ordering for synthesize (it expects keys present)
-    for k in STAT_KEYS:
-        if k not in stats:
-            stats[k] = 0
-    # Use random seed for variety
-    seed = random.randint(0, 2**30)
-    char = synthesize(stats, seed=seed)
-    # Save last character to session for potential export
-    session["last_character"] = char
-    return render_template("result.html", char=char)
-
-@app.route("/static/<path:path>")
-def static_proxy(path):
-    # Serve static files (convenience for some deployments)
-    return send_from_directory("static", path)
+    # Same seed for the whole run, so reloading shows the same character
+    stats, seed, bank = unpack_stats(get_state()), get_seed(), session_bank()
+    cid = character_id(stats, seed, bank.version)
+    if gallery:
+        gallery.record(stats, seed, cid, bank)  # queued; written off the request path
+    if bank is banks.BUILTIN:
+        return redirect(url_for("character", cid=cid))
+    return redirect(url_for("character", cid=cid, bank=bank.name))
+
+# Character pages are fully determined by their ID and the templates, so
+# they get strong ETags and may be cached by proxies for a year
+PERMALINK_MAX_AGE = 365 * 24 * 3600
+
+def _template_digest(*names):
+    # The pages also link to fingerprinted assets, so those count too
+    digest = hashlib.sha1()
+    for name in names:
+        with open(os.path.join(app.root_path, app.template_folder, name), "rb") as f:
+            digest.update(f.read())
+    for path in sorted(ASSETS):
+        digest.update(ASSETS[path].digest.encode())
+    return digest.hexdigest()[:8]
+
+RESULT_TEMPLATE_VERSION = _template_digest("base.html", "result.html")
+with open(export.__file__, "rb") as f:
+    EXPORT_VERSION = hashlib.sha1(f.read()).hexdigest()[:8]
+
+def permalink_character(cid):
+    # (stats, seed, bank) for a permalink ID, or the 404/410 it deserves
+    try:
+        version, stats, seed = parse_character_id(cid)
+    except ValueError:
+        abort(404)
+    bank = get_bank(request.args.get("bank"))
+    if version != bank.version:
+        abort(410)  # forged from content this server no longer has
+    return stats, seed, bank
+
+def permanent(response, etag):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={PERMALINK_MAX_AGE}, immutable"
+    return response
+
+@app.route("/c/<cid>")
+def character(cid):
+    stats, seed, bank = permalink_character(cid)
+    etag = f"{cid}.{RESULT_TEMPLATE_VERSION}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(character_page(cid, stats, seed, bank, request.args.get("bank")))
+    return permanent(response, etag)
+
+def character_page(cid, stats, seed, bank, bank_name):
+    # Result page HTML for a permalink; asgi.py renders batches of these too
+    exports = {fmt: url_for("character_export", cid=cid, fmt=fmt, bank=bank_name)
+               for fmt in export.EXPORT_FORMATS}
+    render = lambda char: render_template("result.html", char=char, exports=exports,
+                                          permalink=url_for("character", cid=cid, bank=bank_name))
+    if character_cache:
+        return character_cache.page("result", stats, seed, render, bank)
+    return render(synthesize(stats, seed=seed, bank=bank))
+
+# Character sheets to download, cached like the pages they come from
+@app.route("/c/<cid>.<any(md, json, pdf):fmt>")
+def character_export(cid, fmt):
+    stats, seed, bank = permalink_character(cid)
+    etag = f"{cid}.{fmt}.{EXPORT_VERSION}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        render = lambda char: export.render_sheet(char, fmt, seed)
+        if character_cache:
+            body = character_cache.page(f"sheet.{fmt}", stats, seed, render, bank)
+        else:
+            body = render(synthesize(stats, seed=seed, bank=bank))
+        response = Response(body, mimetype=export.EXPORT_FORMATS[fmt][1])
+        response.headers["Content-Disposition"] = f'attachment; filename="character-{cid}.{fmt}"'
+    return permanent(response, etag)
+
+# A whole bulk run's sheets as one ZIP, streamed as they are forged
+EXPORT_ZIP_LIMIT = 10_000
+
+@app.route("/export/roster.zip")
+def export_roster():
+    count = request.args.get("count", 100, type=int)
+    fmt = request.args.get("format", "md")
+    rng = request.args.get("rng", "compat")
+    if not 1 <= count <= EXPORT_ZIP_LIMIT:
+        return jsonify({"error": f"count must be 1..{EXPORT_ZIP_LIMIT}"}), 400
+    if fmt not in export.EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(export.EXPORT_FORMATS)}"}), 400
+    if rng not in RNG_MODES:
+        return jsonify({"error": f"rng must be one of {', '.join(RNG_MODES)}"}), 400
+    seed = request.args.get("seed", random.randint(0, 2**30), type=int)
+    response = Response(export.roster_zip(count, seed, fmt, rng), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="roster-{seed}.zip"'
+    return response
+
+# One-shot JSON API: a whole run per request instead of 18 quiz round trips
+FORGE_BATCH_LIMIT = 10_000
+
+def run_bank(run):
+    name = run.get("bank") if isinstance(run, dict) else None
+    try:
+        return banks.get_bank(name)
+    except KeyError:
+        raise ValueError(f"no question bank named {name!r}") from None
+
+def run_seed(run):
+    # The run's seed, or None for a random one
+    seed = run.get("seed") if isinstance(run, dict) else None
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        raise ValueError("seed must be an integer")
+    return seed
+
+def forge_run(run):
+    # {"answers": "abdce..." or ["a", "b", ...], "seed": optional int, "bank": optional name}
+    # -> response dict
+    if not isinstance(run, dict):
+        run = {"answers": run}
+    bank = run_bank(run)
+    state = bank.answers_state(run.get("answers"))
+    seed = run_seed(run)
+    if seed is None:
+        seed = random.randint(0, 2**30)
+    response = {"seed": seed, "character": forge(unpack_stats(state), seed, bank)}
+    if 0 <= seed < 2**32:
+        response["id"] = character_id(unpack_stats(state), seed, bank.version)
+    return response
+
+@app.route("/api/forge", methods=["GET", "POST"])
+def api_forge():
+    if request.method == "POST":
+        run = request.get_json(silent=True)
+    else:
+        run = {"answers": request.args.get("answers"), "seed": request.args.get("seed", type=int),
+               "bank": request.args.get("bank")}
+    try:
+        return jsonify(forge_run(run))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/forge/batch", methods=["POST"])
+def api_forge_batch():
+    # Body: a JSON list of runs (or {"runs": [...]}); streams one JSON line per run
+    runs = request.get_json(silent=True)
+    if isinstance(runs, dict):
+        runs = runs.get("runs")
+    if not isinstance(runs, list):
+        return jsonify({"error": "expected a JSON list of runs"}), 400
+    if len(runs) > FORGE_BATCH_LIMIT:
+        return jsonify({"error": f"at most {FORGE_BATCH_LIMIT} runs per request"}), 400
+    # Check every run before streaming, so a bad one still gets a 400
+    for i, run in enumerate(runs):
+        try:
+            run_bank(run).answers_state(run.get("answers") if isinstance(run, dict) else run)
+            run_seed(run)
+        except ValueError as e:
+            return jsonify({"error": f"run {i}: {e}"}), 400
+    return Response((json.dumps(forge_run(run), ensure_ascii=False) + "\n" for run in runs),
+                    mimetype="application/x-ndjson")
+
+def gallery_page():
+    # ({column: value} filters, rows, cursor) from the query string
+    filters = {column: request.args[column] for column in ("class", "race", "background", "alignment")
+               if request.args.get(column)}
+    rows, cursor = gallery.page(filters, before=request.args.get("before", type=int))
+    return filters, rows, cursor
+
+@app.route("/gallery")
+def gallery_view():
+    if not gallery:
+        abort(404)
+    filters, rows, cursor = gallery_page()
+    for row in rows:
+        bank = None if row["bank"] == banks.DEFAULT else row["bank"]
+        row["link"] = url_for("character", cid=row["cid"], bank=bank)
+    older = url_for("gallery_view", before=cursor, **filters) if cursor else None
+    return render_template("gallery.html", rows=rows, filters=filters, older=older,
+                           classes=CLASSES, races=RACE_SUGGESTIONS)
+
+@app.route("/api/gallery")
+def api_gallery():
+    if not gallery:
+        return jsonify({"error": "the gallery is off (set FORGE_GALLERY)"}), 404
+    filters, rows, cursor = gallery_page()
+    return jsonify({"characters": rows, "next": cursor})
+
+@app.route("/party")
+def party_mode():
+    # Streams one JSON party per line as each is forged
+    if party is None:
+        return jsonify({"error": "party mode needs numpy"}), 501
+    count = min(request.args.get("count", 1, type=int), 1000)
+    size = request.args.get("size", 4, type=int)
+    min_roles = {"healer": request.args.get("healers", 1, type=int)}
+    seed = request.args.get("seed", random.randint(0, 2**30), type=int)
+    try:
+        party.check_constraints(size, distinct_classes=True, min_roles=min_roles, unique_quirks=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    def lines():
+        try:
+            for p in party.generate_parties(count, size=size, min_roles=min_roles, base_seed=seed):
+                yield json.dumps(p, ensure_ascii=False) + "\n"
+        except ValueError as e:  # a party that can't be forged: end the stream with why
+            yield json.dumps({"error": str(e)}) + "\n"
+    return Response(lines(), mimetype="application/x-ndjson")
+
+@app.route("/predictions/stats")
+def prediction_stats():
+    # Cache hit/miss counters for the live class odds
+    return jsonify(predictor.stats() if predictor else {})
+
+@app.route("/cache/stats")
+def cache_stats():
+    # Hit/miss/eviction counters for the character and page caches
+    return jsonify(character_cache.stats() if character_cache else {})
+
+@app.route("/gallery/stats")
+def gallery_stats():
+    # Rows written and dropped, and the writer's backlog
+    return jsonify(gallery.stats() if gallery else {})
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == "static" and values.get("filename") in ASSETS:
+        values["filename"] = ASSETS[values["filename"]].fingerprinted
+
+@app.endpoint("static")
+def static_asset(filename):
+    asset = ASSETS.get(filename)
+    if asset is None:  # added since startup
+        return app.send_static_file(filename)
+    encoding, body = asset.pick(request.accept_encodings)
+    etag = f"{asset.digest}-{encoding}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=asset.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    if filename == asset.path:  # plain name: the content may change
+        response.headers["Cache-Control"] = "no-cache"
+    else:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,296 @@
+"""
+ASGI serving mode for the web app.
+
+    pip install uvicorn
+    uvicorn asgi:app --workers 4
+
+Permalink pages (/c/<id>), the bulk of traffic after a quiz, are handled
+by async code on the event loop. For the built-in questions, parsing the
+ID, the version check and conditional requests (304s) never leave the
+loop; a named bank is looked up on the pool, since that may read its
+file. Pages that have to be forged are coalesced: requests arriving
+within COALESCE_WINDOW seconds (or MAX_BATCH of them) become one job on
+a bounded thread pool, and concurrent requests for the same character
+share a single render.
+
+Every other route runs the Flask app unchanged on the same pool, with
+streamed bodies passed on chunk by chunk; a response keeps its pool slot
+until the last chunk, so a stream that has started is never cut off.
+When MAX_PENDING jobs are already queued or running, new requests get an
+immediate 503 with Retry-After instead of joining the queue. That keeps
+tail latency flat under a spike rather than letting every request wait.
+
+With FORGE_METRICS=1, permalinks served on the loop are timed here and
+recorded as forge_request_seconds{route="character"}, alongside those
+Flask serves (see metrics.py).
+
+    FORGE_ASGI_THREADS=4 FORGE_ASGI_MAX_PENDING=256 FORGE_ASGI_WINDOW=0.002
+"""
+
+import asyncio, io, os, re, sys, time
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.http import parse_etags
+
+import app as web
+from character_generator import parse_character_id
+
+THREADS = int(os.environ.get("FORGE_ASGI_THREADS", 4))
+MAX_PENDING = int(os.environ.get("FORGE_ASGI_MAX_PENDING", 256))
+COALESCE_WINDOW = float(os.environ.get("FORGE_ASGI_WINDOW", 0.002))  # seconds
+MAX_BATCH = 64
+
+_PERMALINK = re.compile(r"^/c/([0-9A-Za-z]+)$")
+
+class Overloaded(Exception):
+    pass
+
+class Pool:
+    """A thread pool that refuses work past `max_pending` jobs instead of queueing it."""
+
+    def __init__(self, threads=THREADS, max_pending=MAX_PENDING):
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="forge")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+
+    def acquire(self):
+        # Only called from the event loop, so a plain counter will do
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded()
+        self.pending += 1
+
+    def release(self):
+        self.pending -= 1
+
+    async def call(self, fn, *args):
+        # For a caller already holding a slot
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def run(self, fn, *args):
+        self.acquire()
+        try:
+            return await self.call(fn, *args)
+        finally:
+            self.release()
+
+def render_pages(items):
+    # One job for a whole batch: a single request context serves every page's url_for
+    pages = []
+    with web.app.test_request_context("/"):
+        for item in items:
+            try:
+                pages.append(web.character_page(*item).encode("utf-8"))
+            except Exception as e:  # fails this page only
+                pages.append(e)
+    return pages
+
+class Coalescer:
+    """Gathers page renders for COALESCE_WINDOW seconds into one pool job.
+
+    A batch takes its pool slot when it opens, so requests that join it
+    are never turned away afterwards.
+    """
+
+    def __init__(self, pool, window=COALESCE_WINDOW, max_batch=MAX_BATCH):
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self.waiting = {}  # key -> future shared by every request for it
+        self.batch = []
+        self.timer = None
+        self.batches = self.coalesced = 0
+
+    async def render(self, key, item):
+        future = self.waiting.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            if not self.batch:
+                self.pool.acquire()
+            future = self.waiting[key] = asyncio.get_running_loop().create_future()
+            self.batch.append((key, item))
+            if len(self.batch) >= self.max_batch:
+                self.flush()
+            elif self.timer is None:
+                self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        # shield: a client hanging up mustn't cancel the render others wait on
+        return await asyncio.shield(future)
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.batch = self.batch, []
+        if batch:
+            self.batches += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        try:
+            pages = await self.pool.call(render_pages, [item for _, item in batch])
+        except Exception as e:
+            pages = [e] * len(batch)
+        finally:
+            self.pool.release()
+        for (key, _), page in zip(batch, pages):
+            future = self.waiting.pop(key)
+            if isinstance(page, Exception):
+                future.set_exception(page)
+            else:
+                future.set_result(page)
+
+# --- WSGI bridge for everything else ---
+
+def wsgi_environ(scope, body):
+    path = scope.get("raw_path") or scope["path"].encode("utf-8")
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": path.decode("latin-1").split("?", 1)[0],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": (scope.get("server") or ("localhost", 80))[0],
+        "SERVER_PORT": str((scope.get("server") or ("localhost", 80))[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin-1").upper().replace("-", "_"), value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = "HTTP_" + name
+        if key in environ:
+            value = environ[key] + ("; " if key == "HTTP_COOKIE" else ",") + value
+        environ[key] = value
+    environ["CONTENT_LENGTH"] = str(len(body))  # the whole body is here, chunked or not
+    return environ
+
+def start_wsgi(environ):
+    # Runs the Flask app up to its first body chunk: (status, headers, iterator, first chunk)
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"], started["headers"] = int(status.split(" ", 1)[0]), headers
+        return started.setdefault("written", []).append
+
+    result = web.app(environ, start_response)
+    chunks = iter(result)
+    first = next(chunks, None)
+    written = b"".join(started.get("written", []))
+    return started["status"], started["headers"], result, chunks, written + (first or b"")
+
+def _next_chunk(chunks):
+    return next(chunks, None)
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return bytes(body)
+
+async def send_response(send, status, headers, body=b"", more=False):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]})
+    await send({"type": "http.response.body", "body": body, "more_body": more})
+
+async def unavailable(send):
+    await send_response(send, 503, [("Content-Type", "text/plain"), ("Retry-After", "1")],
+                        b"The forge is busy; try again in a moment.\n")
+
+class ForgeASGI:
+
+    def __init__(self, pool=None):
+        self.pool = pool or Pool()
+        self.coalescer = Coalescer(self.pool)
+        self.timer = web.app.extensions.get("forge_metrics")  # None unless metrics are on
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                await send({"type": message["type"] + ".complete"})
+                if message["type"] == "lifespan.shutdown":
+                    return
+        if scope["type"] != "http":
+            return
+        try:
+            match = _PERMALINK.match(scope["path"])
+            if match and scope["method"] in ("GET", "HEAD"):
+                start = time.perf_counter()
+                if await self.permalink(scope, send, match[1]):
+                    if self.timer is not None:
+                        self.timer.record("character", time.perf_counter() - start,
+                                          len(dict(scope["headers"]).get(b"cookie", b"")))
+                    return
+            await self.bridge(scope, receive, send)
+        except Overloaded:
+            await unavailable(send)
+
+    async def permalink(self, scope, send, cid):
+        """Serve /c/<cid> on the loop; False leaves it (errors included) to Flask."""
+        try:
+            version, stats, seed = parse_character_id(cid)
+        except ValueError:
+            return False
+        name = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("bank", [None])[0]
+        try:
+            # Other banks may be (re)loaded from disk, so only the built-in one is looked up here
+            bank = web.banks.BUILTIN if name in (None, web.banks.DEFAULT) else \
+                await self.pool.run(web.banks.get_bank, name)
+        except (KeyError, ValueError):
+            return False
+        if bank.version != version:
+            return False
+        etag = f"{cid}.{web.RESULT_TEMPLATE_VERSION}"
+        headers = [("ETag", f'"{etag}"'),
+                   ("Cache-Control", f"public, max-age={web.PERMALINK_MAX_AGE}, immutable")]
+        if_none_match = dict(scope["headers"]).get(b"if-none-match")
+        if if_none_match and parse_etags(if_none_match.decode("latin-1")).contains(etag):
+            await send_response(send, 304, headers)
+            return True
+        page = await self.coalescer.render((cid, name), (cid, stats, seed, bank, name))
+        headers += [("Content-Type", "text/html; charset=utf-8"), ("Content-Length", str(len(page)))]
+        await send_response(send, 200, headers, b"" if scope["method"] == "HEAD" else page)
+        return True
+
+    async def bridge(self, scope, receive, send):
+        # One slot for the whole exchange: once the response has started,
+        # its remaining chunks can't be refused
+        self.pool.acquire()
+        try:
+            environ = wsgi_environ(scope, await read_body(receive))
+            status, headers, result, chunks, first = await self.pool.call(start_wsgi, environ)
+            try:
+                await send_response(send, status, headers, first, more=True)
+                while True:
+                    chunk = await self.pool.call(_next_chunk, chunks)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        finally:
+            self.pool.release()
+
+    def stats(self):
+        return {"pending": self.pool.pending, "max_pending": self.pool.max_pending,
+                "rejected": self.pool.rejected, "batches": self.coalescer.batches,
+                "coalesced": self.coalescer.coalesced}
+
+app = ForgeASGI()
@@ -0,0 +1,55 @@
+"""
+Fingerprinted, precompressed static files for the web app.
+
+Every file under static/ is read once at startup, hashed and compressed
+(gzip always, brotli too if the `brotli` package is installed).
+url_for('static', filename='css/style.css') then gives
+/static/css/style.<hash>.css, which never changes under that name, so
+browsers and proxies may keep it for good.
+"""
+
+import gzip, hashlib, mimetypes, os
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MIN_COMPRESS = 256  # smaller files go out as-is
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+class Asset:
+
+    def __init__(self, path, data):
+        self.path = path
+        self.digest = hashlib.sha1(data).hexdigest()[:12]
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.encodings = {"identity": data}
+        if len(data) >= MIN_COMPRESS and self.mimetype.startswith(COMPRESSIBLE):
+            self.encodings["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(data)
+
+    @property
+    def fingerprinted(self):
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{self.digest}{ext}"
+
+    def pick(self, accept_encodings):
+        """Smallest variant the client accepts, as (encoding, bytes)."""
+        for encoding in ("br", "gzip"):
+            if encoding in self.encodings and accept_encodings[encoding]:
+                return encoding, self.encodings[encoding]
+        return "identity", self.encodings["identity"]
+
+def load_assets(folder):
+    """{served path: Asset} for every file under `folder`, by both plain and fingerprinted path."""
+    assets = {}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            full = os.path.join(root, name)
+            path = os.path.relpath(full, folder).replace(os.sep, "/")
+            with open(full, "rb") as f:
+                asset = Asset(path, f.read())
+            assets[path] = assets[asset.fingerprinted] = asset
+    return assets
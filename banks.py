@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Question banks: your own questions and flavor pools, without touching the code.
+
+A bank is a JSON file (or TOML, on Python 3.11+) in banks/, or in
+$FORGE_BANK_DIR:
+
+    {
+      "questions": [
+        {"q": "A dragon blocks the road. You...",
+         "opts": {"a": ["Draw steel.", {"Bravery": 2}],
+                  "b": ["Ask it a riddle.", {"Cunning": 1, "Curiosity": 1}]}}
+      ],
+      "quirks": ["..."], "flaws": ["..."], "hooks": ["...", "..."],
+      "races": ["..."], "alignments": ["..."], "subclasses": {"Fighter": ["..."]}
+    }
+
+Stats must be among STAT_KEYS. Classes and backgrounds come from the
+scoring rules, so a bank can't rename them. Any pool left out is copied
+from the built-in content.
+
+The first time a bank is used it is validated and compiled next to its
+source as <name>.fgb: a small header, the stat deltas as one int8 array
+(questions x options x stats) and the compressed texts. Later processes
+load that file instead. When the source changes, the bank is recompiled
+on its next use (checked at most every RELOAD_CHECK seconds) and the
+on_reload() callbacks fire, so caches built from the old version can
+drop it. A broken edit keeps the last good version in service.
+
+    python3 banks.py export > banks/mine.json   # built-in content, as a starting point
+    python3 banks.py check banks/mine.json      # validate and compile
+"""
+
+import hashlib, json, os, re, struct, sys, threading, time, zlib
+from array import array
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: JSON banks only
+    tomllib = None
+
+import character_generator as cg
+
+BANK_DIR = os.environ.get("FORGE_BANK_DIR",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), "banks"))
+RELOAD_CHECK = 2.0  # seconds between mtime checks per bank
+DEFAULT = "default"
+
+MAGIC, FORMAT = b"FGBK", 1
+_HEADER = struct.Struct("<4sHHHHI")  # magic, format, questions, max options, stats, text bytes
+_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# bank field -> built-in pool, and the fewest entries synthesize() can use
+POOLS = {
+    "quirks": ("QUIRKS", 1),
+    "flaws": ("FLAWS", 1),
+    "hooks": ("ROLEPLAY_HOOKS", 2),
+    "races": ("RACE_SUGGESTIONS", 1),
+    "alignments": ("ALIGNMENTS", 1),
+    "subclasses": ("SUBCLASS_SUGGESTIONS", 0),
+}
+
+class Bank:
+    """Questions and flavor pools, plus the quiz transition tables for them."""
+
+    def __init__(self, name, version, questions, pools):
+        self.name = name
+        self.version = version
+        self.questions = questions
+        for field, value in pools.items():
+            setattr(self, field, value)
+        self.transitions = [{c: cg._transition(delta) for c, (_, delta) in q["opts"].items()}
+                            for q in questions]
+
+    def next_state(self, state, qid, choice):
+        return cg.next_state(state, qid, choice, self.transitions)
+
+    def answers_state(self, answers):
+        return cg.answers_state(answers, self.transitions)
+
+class BuiltinBank(Bank):
+    """The content of character_generator itself, read live from the module."""
+
+    name = DEFAULT
+    version = property(lambda self: cg.content_version())
+    questions = property(lambda self: cg.QUESTIONS)
+    transitions = property(lambda self: cg.TRANSITIONS)
+    quirks = property(lambda self: cg.QUIRKS)
+    flaws = property(lambda self: cg.FLAWS)
+    hooks = property(lambda self: cg.ROLEPLAY_HOOKS)
+    races = property(lambda self: cg.RACE_SUGGESTIONS)
+    alignments = property(lambda self: cg.ALIGNMENTS)
+    subclasses = property(lambda self: cg.SUBCLASS_SUGGESTIONS)
+
+    def __init__(self):
+        pass
+
+BUILTIN = BuiltinBank()
+
+# --- Source format ---
+
+def validate(data):
+    """Raise ValueError naming the first problem in a parsed bank source."""
+    if not isinstance(data, dict):
+        raise ValueError("a bank is a JSON/TOML object")
+    unknown = set(data) - {"questions"} - set(POOLS)
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(sorted(unknown))}")
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        raise ValueError("questions: expected a non-empty list")
+    for i, q in enumerate(questions, 1):
+        if not isinstance(q, dict) or not isinstance(q.get("q"), str):
+            raise ValueError(f"question {i}: expected {{\"q\": text, \"opts\": {{...}}}}")
+        opts = q.get("opts")
+        if not isinstance(opts, dict) or not opts:
+            raise ValueError(f"question {i}: opts must be a non-empty object")
+        for letter, opt in opts.items():
+            where = f"question {i} option {letter!r}"
+            if not re.fullmatch(r"[a-z]", letter):
+                raise ValueError(f"{where}: options are single letters a-z")
+            if not isinstance(opt, (list, tuple)) or len(opt) != 2 or not isinstance(opt[0], str) \
+                    or not isinstance(opt[1], dict):
+                raise ValueError(f"{where}: expected [text, {{stat: change}}]")
+            for stat, change in opt[1].items():
+                if stat not in cg.STAT_KEYS:
+                    raise ValueError(f"{where}: unknown stat {stat!r}")
+                if not isinstance(change, int) or isinstance(change, bool) or not -128 <= change <= 127:
+                    raise ValueError(f"{where}: {stat} change must be an integer in -128..127")
+    for field, (_, fewest) in POOLS.items():
+        if field not in data:
+            continue
+        pool = data[field]
+        if field == "subclasses":
+            if not isinstance(pool, dict) or set(pool) - set(cg.CLASSES):
+                raise ValueError(f"subclasses: expected {{class: [names]}} for classes in {', '.join(cg.CLASSES)}")
+            pool = [name for names in pool.values() for name in names] if \
+                all(isinstance(names, list) for names in pool.values()) else None
+        if not isinstance(pool, list) or len(pool) < fewest or \
+                not all(isinstance(item, str) and item for item in pool):
+            raise ValueError(f"{field}: expected a list of at least {fewest} non-empty strings")
+
+def read_source(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError("TOML banks need Python 3.11+")
+        return tomllib.loads(raw.decode("utf-8"))
+    return json.loads(raw)
+
+def export_builtin():
+    """The built-in content as bank source data."""
+    data = {"questions": [{"q": q["q"], "opts": {c: [text, delta] for c, (text, delta) in q["opts"].items()}}
+                          for q in cg.QUESTIONS]}
+    for field, (pool, _) in POOLS.items():
+        data[field] = getattr(cg, pool)
+    return data
+
+# --- Compiled format ---
+
+def compile_bank(data):
+    """Validated source data -> compiled bank bytes."""
+    validate(data)
+    questions = data["questions"]
+    n_opts = max(len(q["opts"]) for q in questions)
+    n_stats = len(cg.STAT_KEYS)
+    deltas = array("b", bytes(len(questions) * n_opts * n_stats))
+    texts = {"questions": []}
+    for qi, q in enumerate(questions):
+        letters = sorted(q["opts"])
+        texts["questions"].append({"q": q["q"], "opts": [[c, q["opts"][c][0]] for c in letters]})
+        for oi, c in enumerate(letters):
+            for stat, change in q["opts"][c][1].items():
+                deltas[(qi * n_opts + oi) * n_stats + cg.STAT_KEYS.index(stat)] = change
+    for field, (pool, _) in POOLS.items():
+        texts[field] = data.get(field, getattr(cg, pool))
+    blob = zlib.compress(json.dumps(texts, ensure_ascii=False).encode("utf-8"), 9)
+    header = _HEADER.pack(MAGIC, FORMAT, len(questions), n_opts, n_stats, len(blob))
+    return header + deltas.tobytes() + blob
+
+def _rules_key():
+    # A bank is scored with the live rules (FORGE_RULES may swap them in),
+    # so they are part of its version along with its own bytes
+    return repr((cg.CLASS_RULES, cg.BACKGROUND_RULES, cg.TONE_RULES, cg.DEFAULT_TONE,
+                 cg.TIEBREAK_SPREAD)).encode("utf-8")
+
+def load_compiled(buf, name):
+    magic, fmt, n_q, n_opts, n_stats, n_text = _HEADER.unpack_from(buf)
+    if magic != MAGIC or fmt != FORMAT:
+        raise ValueError("not a compiled bank, or from another version")
+    if n_stats != len(cg.STAT_KEYS):
+        raise ValueError("compiled for a different set of stats")
+    start = _HEADER.size
+    deltas = array("b")
+    deltas.frombytes(buf[start:start + n_q * n_opts * n_stats])
+    texts = json.loads(zlib.decompress(buf[start + len(deltas):start + len(deltas) + n_text]))
+    questions = []
+    for qi, q in enumerate(texts["questions"]):
+        opts = {}
+        for oi, (c, text) in enumerate(q["opts"]):
+            row = deltas[(qi * n_opts + oi) * n_stats:(qi * n_opts + oi + 1) * n_stats]
+            opts[c] = (text, {k: d for k, d in zip(cg.STAT_KEYS, row) if d})
+        questions.append({"q": q["q"], "opts": opts})
+    pools = {field: texts[field] for field in POOLS}
+    return Bank(name, hashlib.sha1(buf + _rules_key()).hexdigest()[:8], questions, pools)
+
+def load_bank(path):
+    """Bank for a source file, compiling it unless an up-to-date .fgb is next to it."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    compiled = os.path.splitext(path)[0] + ".fgb"
+    try:
+        if os.stat(compiled).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            with open(compiled, "rb") as f:
+                return load_compiled(f.read(), name)
+    except (OSError, ValueError, KeyError, TypeError, struct.error, zlib.error):
+        pass  # missing, stale or malformed: rebuild below
+    buf = compile_bank(read_source(path))
+    try:
+        tmp = f"{compiled}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(buf)
+        os.replace(tmp, compiled)
+    except OSError:
+        pass  # read-only directory: keep it in memory only
+    return load_compiled(buf, name)
+
+# --- Registry ---
+
+_loaded = {}  # name -> [bank, source path, source mtime, last check]
+_reload_callbacks = []
+_lock = threading.Lock()
+
+def on_reload(callback):
+    """Call callback(name, old_version) whenever a loaded bank is replaced."""
+    _reload_callbacks.append(callback)
+    return callback
+
+def _source(name):
+    for ext in (".json", ".toml"):
+        path = os.path.join(BANK_DIR, name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def bank_names():
+    names = {DEFAULT}
+    if os.path.isdir(BANK_DIR):
+        names.update(os.path.splitext(f)[0] for f in os.listdir(BANK_DIR)
+                     if f.endswith((".json", ".toml")) and _NAME.match(os.path.splitext(f)[0]))
+    return sorted(names)
+
+def get_bank(name=None):
+    """Bank `name` (None or "default": the built-in one); KeyError if there's no such bank."""
+    if not name or name == DEFAULT:
+        return BUILTIN
+    entry = _loaded.get(name)
+    now = time.monotonic()
+    if entry is not None and now - entry[3] < RELOAD_CHECK:
+        return entry[0]
+    if not _NAME.match(name):
+        raise KeyError(name)
+    replaced = None
+    with _lock:
+        entry = _loaded.get(name)
+        path = _source(name)
+        if path is None:
+            _loaded.pop(name, None)
+            raise KeyError(name)
+        mtime = os.stat(path).st_mtime_ns
+        if entry is not None and entry[1] == path and entry[2] == mtime:
+            entry[3] = now
+            return entry[0]
+        try:
+            bank = load_bank(path)
+        except (OSError, ValueError) as e:
+            if entry is None:
+                raise ValueError(f"bank {name!r}: {e}") from e
+            print(f"bank {name!r} not reloaded, keeping the last good version: {e}", file=sys.stderr)
+            entry[2:] = [mtime, now]
+            return entry[0]
+        if entry is not None and entry[0].version != bank.version:
+            replaced = entry[0].version
+        _loaded[name] = [bank, path, mtime, now]
+    if replaced is not None:
+        for callback in _reload_callbacks:
+            callback(name, replaced)
+    return bank
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["export"]:
+        print(json.dumps(export_builtin(), indent=2, ensure_ascii=False))
+        return 0
+    if args[:1] == ["check"] and len(args) > 1:
+        status = 0
+        for path in args[1:]:
+            try:
+                bank = load_bank(path)
+            except (OSError, ValueError) as e:
+                print(f"{path}: {e}")
+                status = 1
+                continue
+            print(f"{path}: ok, version {bank.version}, {len(bank.questions)} questions")
+        return status
+    print("usage: banks.py export | banks.py check FILE...")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
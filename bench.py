@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the generator and the web flow.
+
+    python3 bench.py                          # table of results
+    python3 bench.py --json > baseline.json   # save them
+    python3 bench.py --compare baseline.json  # exit 1 on regressions
+
+Covers synthesize() over representative stat vectors, clamp_stats(),
+quick_demo(), bulk throughput, and full 18-question runs through the
+Flask test client (requests/sec, p50/p99 latency, session cookie size
+per step).
+
+--compare flags any metric that got worse than the baseline by more than
+--tolerance (default 0.15, i.e. 15%), so a release can be gated on it.
+Timings only compare fairly on the same machine. --quick runs a tenth of
+the iterations, for a smoke check; --no-web skips the Flask part.
+"""
+
+import contextlib, io, json, platform, random, sys, time, timeit
+
+import character_generator as cg
+import cli
+
+# The all-zero start, the clamp floor and ceiling, an all-tied profile,
+# values the clamp has to pull in, and a typical random quiz run
+PROFILES = {
+    "start": cg.init_stats(),
+    "floor": {k: cg.STAT_MIN for k in cg.STAT_KEYS},
+    "ceiling": {k: cg.STAT_MAX for k in cg.STAT_KEYS},
+    "tied": {k: 4 for k in cg.STAT_KEYS},
+    "out_of_range": {k: (-9 if i % 2 else 17) for i, k in enumerate(cg.STAT_KEYS)},
+    "typical": cg.random_stats(random.Random(7)),
+}
+
+def _metric(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+def _per_call_us(fn, number, repeat=5):
+    # Best of `repeat`: the least disturbed run is the most repeatable
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+def _n(base, scale):
+    return max(1, int(base * scale))
+
+def bench_generator(scale):
+    metrics = {}
+    for name, stats in PROFILES.items():
+        metrics[f"synthesize.{name}"] = _metric(
+            _per_call_us(lambda: cg.synthesize(stats, seed=42), _n(2000, scale)), "us")
+    stats = PROFILES["out_of_range"]
+    metrics["clamp_stats"] = _metric(_per_call_us(lambda: cg.clamp_stats(stats.copy()), _n(20000, scale)), "us")
+
+    def demo():
+        with contextlib.redirect_stdout(io.StringIO()):
+            cg.quick_demo(seed=42)
+    metrics["quick_demo"] = _metric(_per_call_us(demo, _n(200, scale)), "us")
+    return metrics
+
+def bench_bulk(scale):
+    metrics = {}
+    count = _n(5000, scale)
+    start = time.perf_counter()
+    for _ in cg.bulk_chunks(count, base_seed=0, fmt="jsonl"):
+        pass
+    metrics["bulk.jsonl"] = _metric(count / (time.perf_counter() - start), "chars/s", "higher")
+    if cg.np is not None:
+        cg._get_batch_tables()  # built once per process; not part of the rate
+    start = time.perf_counter()
+    for _ in cg.bulk_chunks(count, base_seed=0, fmt="jsonl", rng="counter"):
+        pass
+    metrics["bulk.jsonl_counter"] = _metric(count / (time.perf_counter() - start), "chars/s", "higher")
+    if cg.np is not None:
+        count = _n(100_000, scale)
+        stats = cg.np.random.default_rng(0).integers(cg.STAT_MIN, cg.STAT_MAX + 1,
+                                                     size=(count, len(cg.STAT_KEYS)))
+        cg.synthesize_batch(stats[:10], cg.np.arange(10))  # build the tables first
+        start = time.perf_counter()
+        cg.synthesize_batch(stats, cg.np.arange(count))
+        metrics["bulk.batch"] = _metric(count / (time.perf_counter() - start), "chars/s", "higher")
+    return metrics
+
+def bench_web(scale):
+    """Full quiz runs through the test client; returns (metrics, cookie bytes per step)."""
+    from app import app
+    client = app.test_client()
+    rng = random.Random(0)
+    latencies, cookie_steps = [], []
+
+    def timed(method, url, **kwargs):
+        start = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        return response
+
+    def cookie_size():
+        cookie = client.get_cookie("session")
+        return len(cookie.value) if cookie else 0
+
+    runs = _n(20, scale)
+    start = time.perf_counter()
+    for run in range(runs + 1):
+        if run == 1:  # the first run warms caches and isn't counted
+            latencies.clear()
+            start = time.perf_counter()
+        steps = []
+        timed("get", "/")
+        steps.append(cookie_size())
+        for qid, q in enumerate(cg.QUESTIONS):
+            timed("get", f"/quiz/{qid}")
+            timed("post", f"/quiz/{qid}", data={"choice": rng.choice(sorted(q["opts"]))})
+            steps.append(cookie_size())
+        response = timed("get", "/result")
+        if response.status_code == 302:
+            timed("get", response.headers["Location"])
+        steps.append(cookie_size())
+        cookie_steps = steps
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    metrics = {
+        "web.requests_per_sec": _metric(len(latencies) / elapsed, "req/s", "higher"),
+        "web.p50": _metric(cli.percentile(latencies, 0.50) * 1e3, "ms"),
+        "web.p99": _metric(cli.percentile(latencies, 0.99) * 1e3, "ms"),
+        "web.cookie_bytes_max": _metric(max(cookie_steps), "bytes"),
+    }
+    return metrics, cookie_steps
+
+def run_all(scale=1, web=True):
+    results = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                        "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "scale": scale,
+                        "content_version": cg.content_version()},
+               "metrics": {}, "details": {}}
+    results["metrics"].update(bench_generator(scale))
+    results["metrics"].update(bench_bulk(scale))
+    if web:
+        metrics, steps = bench_web(scale)
+        results["metrics"].update(metrics)
+        # index, after each question, result page
+        results["details"]["cookie_bytes_by_step"] = steps
+    return results
+
+def print_results(results):
+    for name, m in results["metrics"].items():
+        print(f"{name:28} {m['value']:>14,.2f} {m['unit']}")
+    steps = results["details"].get("cookie_bytes_by_step")
+    if steps:
+        print(f"{'cookie bytes by step':28} {' '.join(map(str, steps))}")
+
+def compare(results, baseline, tolerance, out=sys.stdout):
+    """Print each metric against the baseline; returns the names that regressed."""
+    regressed = []
+    for name, m in results["metrics"].items():
+        old = baseline.get("metrics", {}).get(name)
+        if not old or not old["value"]:
+            print(f"{name:28} {m['value']:>14,.2f} {m['unit']:8} (no baseline)", file=out)
+            continue
+        change = m["value"] / old["value"] - 1
+        worse = -change if m["better"] == "higher" else change
+        flag = ""
+        if worse > tolerance:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:28} {m['value']:>14,.2f} {m['unit']:8} vs {old['value']:>12,.2f}  {change:+7.1%}{flag}",
+              file=out)
+    return regressed
+
+def main():
+    try:
+        # --quick: a tenth of the iterations, with at least one of everything
+        scale = 0.1 if "--quick" in sys.argv else 1
+        tolerance = cli.flag("--tolerance", 0.15, float)
+        baseline_path = cli.flag("--compare")
+        baseline = None
+        if baseline_path:
+            with open(baseline_path, encoding="utf-8") as f:
+                baseline = json.load(f)
+    except (ValueError, OSError) as e:
+        print(f"error: {e}")
+        print("usage: bench.py [--quick] [--no-web] [--json] [--compare BASELINE.json [--tolerance 0.15]]")
+        return 1
+    results = run_all(scale=scale, web="--no-web" not in sys.argv)
+    if "--json" in sys.argv:
+        print(json.dumps(results, indent=2))
+    elif baseline is None:
+        print_results(results)
+    if baseline is not None:
+        # With --json, stdout is the new results file
+        regressed = compare(results, baseline, tolerance, sys.stderr if "--json" in sys.argv else sys.stdout)
+        if regressed:
+            print(f"{len(regressed)} metric(s) regressed by more than {tolerance:.0%}: "
+                  f"{', '.join(regressed)}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
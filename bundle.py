@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+The quiz as data, for running it in the browser.
+
+    python3 bundle.py > bundle.json     # the built-in questions' bundle
+    python3 bundle.py --check 20000     # run the JS engine in node against Python
+
+A bundle holds everything static/js/script.js needs to play a whole run
+without the server: each question's options with their stat changes as
+arrays in STAT_KEYS order, the clamp bounds, and the compiled scoring
+rules (per-stat feature masks plus the clause masks of each class and
+tone rule) for showing where the answers are leaning. The server then
+only sees the finished answers, checks them against the state the
+client reports, and renders the result. Its version is a digest of its
+own bytes, so it can be cached for good under that name.
+
+--check feeds random answer runs through the JS engine (all of
+script.js, run under node) and compares the state, class base scores and tone with
+answers_state() and the tables synthesize() uses.
+"""
+
+import hashlib, json, os, random, subprocess, sys
+
+import character_generator as cg
+import cli
+import banks
+
+def build_bundle(bank=banks.BUILTIN):
+    """The bundle for `bank` as a dict (without its version)."""
+    if len(cg.FEATURES) > 31:
+        raise ValueError("too many rule features for 32-bit masks in the browser")
+    questions = []
+    for q in bank.questions:
+        questions.append({"q": q["q"], "opts": [[c, text, [delta.get(k, 0) for k in cg.STAT_KEYS]]
+                                                for c, (text, delta) in q["opts"].items()]})
+    start = cg.clamp_stats(cg.init_stats())
+    return {
+        "bank": bank.name,
+        "stats": cg.STAT_KEYS,
+        "min": cg.STAT_MIN,
+        "max": cg.STAT_MAX,
+        "start": [start[k] for k in cg.STAT_KEYS],
+        "questions": questions,
+        "stat_masks": [cg._STAT_MASKS[k] for k in cg.STAT_KEYS],
+        "classes": cg.CLASSES,
+        "class_rules": [[cg._clause_masks(conditions), [weights.get(c, 0) for c in cg.CLASSES]]
+                        for conditions, weights in cg.CLASS_RULES],
+        "tone_rules": [[cg._clause_masks(conditions), tone] for conditions, tone in cg.TONE_RULES],
+        "default_tone": cg.DEFAULT_TONE,
+    }
+
+def bundle_bytes(bank=banks.BUILTIN):
+    """(version, compact JSON bytes) for `bank`; the version is also inside the JSON."""
+    data = build_bundle(bank)
+    version = hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    body = json.dumps({"version": version, **data}, ensure_ascii=False, separators=(",", ":"))
+    return version, body.encode("utf-8")
+
+# --- Parity check against the JS engine ---
+
+def script_source():
+    """static/js/script.js as the browser loads it."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "js", "script.js")
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def run_node(bundle, runs):
+    """[(state, class scores, tone)] from the JS engine for each answer string.
+
+    The whole of script.js is run (with a stub `document`), so a file the
+    browser couldn't parse fails here too.
+    """
+    program = "const document = {addEventListener() {}};\n" + script_source() + r"""
+const input = JSON.parse(require("fs").readFileSync(0, "utf8"));
+const out = input.runs.map(answers => {
+  let stats = ForgeEngine.start(input.bundle);
+  [...answers].forEach((choice, qid) => { stats = ForgeEngine.answer(input.bundle, stats, qid, choice); });
+  return [ForgeEngine.pack(input.bundle, stats), ForgeEngine.classScores(input.bundle, stats),
+          ForgeEngine.tone(input.bundle, stats)];
+});
+process.stdout.write(JSON.stringify(out));
+"""
+    done = subprocess.run(["node", "-e", program], input=json.dumps({"bundle": bundle, "runs": runs}),
+                          capture_output=True, text=True, check=True)
+    return json.loads(done.stdout)
+
+def check(count, seed=0, bank=banks.BUILTIN):
+    """Compare the JS engine with Python on `count` random runs; returns the mismatches."""
+    bundle = json.loads(bundle_bytes(bank)[1])
+    rng = random.Random(seed)
+    runs = ["".join(rng.choice(sorted(q["opts"])) for q in bank.questions) for _ in range(count)]
+    mismatches = []
+    for answers, (state, scores, tone) in zip(runs, run_node(bundle, runs)):
+        expected = bank.answers_state(answers)
+        stats = cg.unpack_stats(expected)
+        base = cg._CLASS_TABLE[cg.feature_mask(stats) & cg._CLASS_FEATURES]
+        if (state, tuple(scores), tone) != (expected, base, cg.synthesize(stats, seed=0)["tone"]):
+            mismatches.append(answers)
+    return mismatches
+
+def main():
+    if "--check" in sys.argv:
+        try:
+            count, seed = cli.flag("--check", 10_000, int), cli.flag("--seed", 0, int)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            print("usage: bundle.py [--check N [--seed S]]", file=sys.stderr)
+            return 1
+        try:
+            mismatches = check(count, seed)
+        except OSError as e:
+            print(f"error: could not run node: {e}", file=sys.stderr)
+            return 1
+        except subprocess.CalledProcessError as e:
+            print(f"error: script.js failed under node:\n{e.stderr.strip()}", file=sys.stderr)
+            return 1
+        print(f"{count - len(mismatches)}/{count} runs agree")
+        for answers in mismatches[:10]:
+            print(f"  differs: {answers}")
+        return 1 if mismatches else 0
+    sys.stdout.buffer.write(bundle_bytes()[1] + b"\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Command-line helpers shared by the scripts (character_generator.py,
+bench.py, loadgen.py, export.py, tune.py, bundle.py, outcomes.py).
+
+    seed = flag("--seed", 0, int)
+    fmt = flag("--format", "jsonl", choices=BULK_FORMATS)
+
+Flags are `--name value` pairs anywhere in sys.argv. A value that is
+missing or doesn't parse is a ValueError naming the flag, never a quiet
+fall back to the default; the scripts print it with their usage line and
+exit 1.
+"""
+
+import sys
+
+_KIND_NAMES = {int: "an integer", float: "a number"}
+
+def flag(name, default=None, kind=str, choices=None):
+    """The value after `name` in sys.argv converted by `kind`, or `default` if it isn't given."""
+    if name not in sys.argv:
+        return default
+    i = sys.argv.index(name) + 1
+    if i == len(sys.argv):
+        raise ValueError(f"{name} needs a value")
+    try:
+        value = kind(sys.argv[i])
+    except ValueError:
+        raise ValueError(f"{name} must be {_KIND_NAMES.get(kind, kind.__name__)}, "
+                         f"not {sys.argv[i]!r}") from None
+    if choices is not None and value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}")
+    return value
+
+def percentile(sorted_values, p):
+    """The value a fraction `p` of the way up a sorted, non-empty list (nearest rank)."""
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
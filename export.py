@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Character sheets as Markdown, JSON or PDF, one at a time or a whole ZIP.
+
+    python3 export.py --format md --seed 42                # one sheet to stdout
+    python3 export.py --format pdf --seed 42 > sheet.pdf
+    python3 export.py --zip --count 5000 --format pdf > roster.zip
+
+Characters are the bulk run's (see character_generator.iter_characters):
+--seed is the base seed, --rng picks the random stream. The ZIP is
+written entry by entry as characters are forged, so memory doesn't grow
+with --count beyond the archive's small per-file directory record.
+
+The PDF writer is a deliberately small one: Helvetica, text only, page
+breaks as needed, no dependencies.
+"""
+
+import json, sys, textwrap, zipfile
+
+import character_generator as cg
+import cli
+
+# --- Sheet renderers: (char, seed) -> bytes ---
+
+def _title(char):
+    return f"{char['race suggestion']} {char['class']} ({char['subclass suggestion']})"
+
+def sheet_markdown(char, seed=None):
+    lines = [f"# {_title(char)}", "",
+             f"*{char['alignment']} · {char['background']}*", "",
+             f"> {char['background blurb']}", "",
+             f"**Tone:** {char['tone']}  ",
+             f"**Quirk:** {char['quirk']}  ",
+             f"**Flaw:** {char['flaw']}", "",
+             "## Stats", "", "| Stat | Value |", "|---|---:|"]
+    lines += [f"| {k} | {v:+d} |" for k, v in char["stats"].items()]
+    lines += ["", "## Roleplay hooks", ""] + [f"- {h}" for h in char["hooks"]]
+    if char["tips"]:
+        lines += ["", "## Tips", ""] + [f"- {t}" for t in char["tips"]]
+    if seed is not None:
+        lines += ["", f"<sub>Seed {seed}</sub>"]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def sheet_json(char, seed=None):
+    sheet = char if seed is None else {"seed": seed, **char}
+    return (json.dumps(sheet, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+
+# PDF: A4 in points, one text column
+_PAGE_W, _PAGE_H, _MARGIN = 595, 842, 56
+_WRAP = 88  # characters per line at 11pt Helvetica, roughly
+
+def _pdf_text(text):
+    # WinAnsi covers the curly quotes and dashes the content uses
+    raw = text.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def _pdf_lines(char, seed):
+    # (font, size, text): F1 regular, F2 bold
+    lines = [("F2", 18, _title(char)), ("F1", 11, f"{char['alignment']} - {char['background']}"),
+             ("F1", 11, "")]
+    def section(heading, body):
+        lines.append(("F2", 13, heading))
+        for text in body:
+            for part in textwrap.wrap(text, _WRAP) or [""]:
+                lines.append(("F1", 11, part))
+        lines.append(("F1", 11, ""))
+    section("Background", [char["background blurb"]])
+    section("Tone, quirk & flaw", [f"Tone: {char['tone']}", f"Quirk: {char['quirk']}",
+                                   f"Flaw: {char['flaw']}"])
+    section("Stats", [f"{k}: {v:+d}" for k, v in char["stats"].items()])
+    section("Roleplay hooks", [f"- {h}" for h in char["hooks"]])
+    if char["tips"]:
+        section("Tips", [f"- {t}" for t in char["tips"]])
+    if seed is not None:
+        lines.append(("F1", 9, f"Seed {seed}"))
+    return lines
+
+def sheet_pdf(char, seed=None):
+    pages, ops, y = [], [], _PAGE_H - _MARGIN
+    for font, size, text in _pdf_lines(char, seed):
+        if y - size < _MARGIN:
+            pages.append(ops)
+            ops, y = [], _PAGE_H - _MARGIN
+        y -= size * 1.4
+        if text:
+            ops.append(b"BT /%s %d Tf %d %.1f Td (%s) Tj ET" % (font.encode(), size, _MARGIN, y,
+                                                              _pdf_text(text)))
+    pages.append(ops)
+
+    # Objects: 1 catalog, 2 page tree, 3-4 fonts, then a page and its content stream per page
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for ops in pages:
+        stream = b"\n".join(ops)
+        page_id = len(objects) + 1
+        kids.append(b"%d 0 R" % page_id)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                       b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                       % (_PAGE_W, _PAGE_H, page_id + 1))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(pages))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+# format -> (renderer, mimetype)
+EXPORT_FORMATS = {
+    "md": (sheet_markdown, "text/markdown; charset=utf-8"),
+    "json": (sheet_json, "application/json"),
+    "pdf": (sheet_pdf, "application/pdf"),
+}
+
+def render_sheet(char, fmt, seed=None):
+    return EXPORT_FORMATS[fmt][0](char, seed)
+
+# --- Streaming ZIP ---
+
+class _Sink:
+    # Write-only file for ZipFile; not seekable, so entries get data descriptors
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def zip_stream(entries):
+    """Yield a ZIP archive of (name, bytes) entries piece by piece, one entry at a time.
+
+    Timestamps are fixed, so the same entries always give the same bytes.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, data)
+            yield sink.drain()
+    yield sink.drain()
+
+def roster_entries(pairs, fmt):
+    """(name, sheet) for each (seed, character) pair."""
+    for seed, char in pairs:
+        yield f"character-{seed}.{fmt}", render_sheet(char, fmt, seed)
+
+def roster_zip(count, base_seed=0, fmt="md", rng="compat"):
+    """Stream the sheets of a bulk run as a ZIP."""
+    return zip_stream(roster_entries(cg.iter_characters(0, count, base_seed, rng), fmt))
+
+def main():
+    try:
+        fmt = cli.flag("--format", "md", choices=EXPORT_FORMATS)
+        rng = cli.flag("--rng", "compat", choices=cg.RNG_MODES)
+        seed = cli.flag("--seed", 0, int)
+        count = cli.flag("--count", 1, int)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        print("usage: export.py [--format md|json|pdf] [--seed S] [--rng compat|counter]"
+              " [--zip --count N]", file=sys.stderr)
+        return 1
+    out = sys.stdout.buffer
+    if "--zip" in sys.argv:
+        for piece in roster_zip(count, seed, fmt, rng):
+            out.write(piece)
+    else:
+        for seed, char in cg.iter_characters(0, count, seed, rng):
+            out.write(render_sheet(char, fmt, seed))
+    out.flush()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Small in-process caches shared by the web app and the analysis tools.
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import character_generator as cg
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry.
+
+    With `ttl` (seconds) entries also expire that long after they were put.
+    Keeps hit/miss/eviction/expiration counters; safe to share between
+    request threads.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def evict(self, match):
+        """Drop every entry whose key satisfies match(key); returns how many went."""
+        with self._lock:
+            doomed = [key for key in self._data if match(key)]
+            for key in doomed:
+                del self._data[key]
+            self.evictions += len(doomed)
+        return len(doomed)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "expirations": self.expirations}
+
+class CharacterCache:
+    """Memoizes synthesize() and the pages rendered from its output.
+
+    Keys are (clamped stats, seed, bank name, bank version), so editing a
+    pool means old entries are never hit again; both caches are also
+    cleared as soon as a new built-in content version turns up, and
+    evict() drops a reloaded bank's old entries. Cached characters are
+    shared: treat them as read-only.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.characters = LRUCache(maxsize, ttl)
+        self.pages = LRUCache(maxsize, ttl)
+        self.version = cg.content_version()
+
+    def key(self, stats, seed, bank=None):
+        version = cg.content_version()
+        if version != self.version:
+            self.characters.clear()
+            self.pages.clear()
+            self.version = version
+        clamped = cg.clamp_stats({k: stats.get(k, 0) for k in cg.STAT_KEYS})
+        if bank is not None:
+            return (tuple(clamped.values()), seed, bank.name, bank.version)
+        return (tuple(clamped.values()), seed, "default", version)
+
+    def synthesize(self, stats, seed, bank=None):
+        key = self.key(stats, seed, bank)
+        char = self.characters.get(key)
+        if char is None:
+            char = cg.synthesize(stats, seed=seed, bank=bank)
+            self.characters.put(key, char)
+        return char
+
+    def page(self, name, stats, seed, render, bank=None):
+        """Page `name` for this character; render(char) builds it on a miss."""
+        key = (name,) + self.key(stats, seed, bank)
+        html = self.pages.get(key)
+        if html is None:
+            html = render(self.synthesize(stats, seed, bank))
+            self.pages.put(key, html)
+        return html
+
+    def evict(self, bank_name, version):
+        """Drop everything built from version `version` of bank `bank_name`."""
+        match = lambda key: key[-2:] == (bank_name, version)
+        return self.characters.evict(match) + self.pages.evict(match)
+
+    def stats(self):
+        return {"version": self.version, "characters": self.characters.stats(),
+                "pages": self.pages.stats()}
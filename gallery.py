@@ -0,0 +1,172 @@
+"""
+Optional gallery of forged characters, kept in SQLite.
+
+    FORGE_GALLERY=gallery.db python3 app.py
+    curl 'localhost:5000/api/gallery?class=Wizard&race=Tiefling'
+
+Each finished quiz run is queued with record() and written by a
+background thread in batches (up to BATCH_SIZE rows, or whatever arrived
+within FLUSH_EVERY seconds), so a request never waits on the disk. The
+queue is bounded: when the writer falls that far behind, new runs are
+counted as dropped instead of piling up in memory.
+
+The database runs in WAL mode, so readers never block the writer. Pages
+are fetched by keyset: "rows with id below the last one shown", which an
+index on (filters, id) answers directly however many rows the table has.
+Each filter on its own and each pair of class, race and background has
+one. Other combinations search the best of those and check the remaining
+filter row by row, which at worst reads a few times more rows than shown.
+"""
+
+import queue, sqlite3, sys, threading, time
+
+import character_generator as cg
+
+BATCH_SIZE = 500
+FLUSH_EVERY = 0.5  # seconds
+MAX_PENDING = 100_000
+PAGE_SIZE = 50
+FILTERS = ("class", "race", "background", "alignment")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS characters (
+    id INTEGER PRIMARY KEY,
+    cid TEXT NOT NULL,
+    bank TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    class TEXT NOT NULL,
+    background TEXT NOT NULL,
+    race TEXT NOT NULL,
+    alignment TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS characters_cid ON characters (cid, bank);
+CREATE INDEX IF NOT EXISTS characters_class ON characters (class, id);
+CREATE INDEX IF NOT EXISTS characters_class_race ON characters (class, race, id);
+CREATE INDEX IF NOT EXISTS characters_class_background ON characters (class, background, id);
+CREATE INDEX IF NOT EXISTS characters_race ON characters (race, id);
+CREATE INDEX IF NOT EXISTS characters_race_background ON characters (race, background, id);
+CREATE INDEX IF NOT EXISTS characters_background ON characters (background, id);
+CREATE INDEX IF NOT EXISTS characters_alignment ON characters (alignment, id);
+"""
+
+_INSERT = ("INSERT OR IGNORE INTO characters "
+           "(cid, bank, seed, state, class, background, race, alignment, created) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_STOP = object()
+
+class Gallery:
+
+    def __init__(self, path, batch_size=BATCH_SIZE, flush_every=FLUSH_EVERY, max_pending=MAX_PENDING):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_every = flush_every
+        self.written = self.dropped = 0
+        self._queue = queue.Queue(max_pending)
+        self._local = threading.local()
+        self._connect().close()  # create the schema before the first read
+        self._writer = threading.Thread(target=self._write_loop, name="gallery-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _reader(self):
+        # One connection per request thread; sqlite3 connections aren't shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(self, stats, seed, cid, bank):
+        """Queue a finished run; the writer thread forges and stores it. Never blocks."""
+        try:
+            self._queue.put_nowait((stats, seed, cid, bank, time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _row(self, stats, seed, cid, bank, created):
+        char = cg.synthesize(stats, seed=seed, bank=bank)
+        return (cid, bank.name, seed, cg.pack_stats(char["stats"]), char["class"], char["background"],
+                char["race suggestion"], char["alignment"], created)
+
+    def _write_loop(self):
+        conn = self._connect()
+        stop = False
+        while not stop:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_every
+            while len(items) < self.batch_size and items[-1] is not _STOP:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if items[-1] is _STOP:
+                stop = True
+                items.pop()
+            if items:
+                self._write(conn, items)
+            for _ in range(len(items) + stop):
+                self._queue.task_done()
+        conn.close()
+
+    def _write(self, conn, items):
+        # One transaction per batch, but a bad row only costs itself: a failed
+        # INSERT is undone on its own and the rest of the batch goes on
+        try:
+            changes = conn.total_changes
+            with conn:
+                for item in items:
+                    try:
+                        conn.execute(_INSERT, self._row(*item))
+                    except sqlite3.OperationalError:
+                        raise  # not this row's fault
+                    except Exception as e:  # a run that can't be forged or stored
+                        print(f"gallery: dropped {item[2]}: {e!r}", file=sys.stderr)
+                        self.dropped += 1
+            self.written += conn.total_changes - changes  # reloads of a result are ignored
+        except sqlite3.Error as e:  # the database itself is failing
+            print(f"gallery: dropped a batch of {len(items)}: {e}", file=sys.stderr)
+            self.dropped += len(items)
+
+    def flush(self):
+        """Wait until everything queued so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    def page(self, filters=None, before=None, limit=PAGE_SIZE):
+        """Newest rows matching `filters` ({column: value}) with id below `before`.
+
+        Returns (rows, cursor): pass cursor back as `before` for the next
+        page; it is None on the last one.
+        """
+        clauses, args = [], []
+        for column, value in (filters or {}).items():
+            if column not in FILTERS:
+                raise ValueError(f"can't filter on {column!r}")
+            clauses.append(f"{column} = ?")
+            args.append(value)
+        if before is not None:
+            clauses.append("id < ?")
+            args.append(before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(
+            f"SELECT * FROM characters {where} ORDER BY id DESC LIMIT ?", args + [limit + 1]).fetchall()
+        cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+        return [dict(row) for row in rows[:limit]], cursor
+
+    def stats(self):
+        return {"path": self.path, "written": self.written, "dropped": self.dropped,
+                "pending": self._queue.qsize()}
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Load generator: simulated players walking / -> /quiz/0..17 -> /result.
+
+    python3 loadgen.py --players 500 --concurrency 20            # WSGI app in-process
+    python3 loadgen.py --serve --players 2000 --rate 50 --think 0.2
+    python3 loadgen.py --url http://127.0.0.1:5000 --pid 4242 --answers skewed --json
+
+Each player keeps its own session cookie, answers every question (from the
+--answers distribution), pauses --think seconds on average between pages,
+then follows /result to its permalink. Players arrive at --rate per second
+(Poisson), or back to back when the rate is 0, with at most --concurrency
+of them active at once.
+
+Targets: the app in this process (default), a server started here on a
+free localhost port (--serve), or one already running on localhost
+(--url). Nothing ever leaves the machine.
+
+Reports throughput, latency percentiles per kind of request, error rate,
+and the server's resident memory sampled over the run. For --url that
+needs the server's process ID (--pid); without it memory isn't reported.
+"""
+
+import http.client, json, os, random, socket, subprocess, sys, threading, time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+import character_generator as cg
+import cli
+
+ANSWER_MODES = {
+    "uniform": None,
+    "first": [1.0],                                # always the first option
+    "skewed": [0.4, 0.25, 0.15, 0.12, 0.08],      # a > b > c ...
+}
+MEMORY_SAMPLE_EVERY = 0.5  # seconds
+
+# --- Clients: one per player, (status, location) per request ---
+
+class WSGIClient:
+    """Drives the Flask app in this process through its test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code, response.headers.get("Location")
+
+class HTTPClient:
+    """Talks HTTP to a localhost server, carrying the session cookie by hand."""
+
+    def __init__(self, host, port):
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.cookie = None
+
+    def request(self, method, path, data=None):
+        headers = {"Cookie": self.cookie} if self.cookie else {}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()  # reconnect on the next request
+            raise
+        cookie = response.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        location = response.getheader("Location")
+        if location:
+            location = urlsplit(location).path
+        return response.status, location
+
+# --- Players ---
+
+class Recorder:
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.players = 0
+        self._lock = threading.Lock()
+
+    def record(self, kind, elapsed, ok):
+        with self._lock:
+            self.latencies[kind].append(elapsed)
+            if not ok:
+                self.errors[kind] += 1
+
+def _choose(rng, q, weights):
+    letters = sorted(q["opts"])
+    if weights is None:
+        return rng.choice(letters)
+    return rng.choices(letters, weights=(weights + [0] * len(letters))[:len(letters)])[0]
+
+def play(client, rng, recorder, answers, think):
+    def step(kind, method, path, data=None, expect=200):
+        start = time.perf_counter()
+        try:
+            status, location = client.request(method, path, data)
+        except Exception:
+            recorder.record(kind, time.perf_counter() - start, False)
+            return None
+        recorder.record(kind, time.perf_counter() - start, status == expect)
+        return location
+
+    def pause():
+        if think:
+            time.sleep(rng.expovariate(1 / think))
+
+    step("index", "GET", "/")
+    for qid, q in enumerate(cg.QUESTIONS):
+        pause()
+        step("quiz_get", "GET", f"/quiz/{qid}")
+        if isinstance(answers, str):
+            choice = answers[qid]
+        else:
+            choice = _choose(rng, q, answers)
+        step("quiz_post", "POST", f"/quiz/{qid}", {"choice": choice}, expect=302)
+    location = step("result", "GET", "/result", expect=302)
+    if location:
+        step("character", "GET", location)
+    with recorder._lock:
+        recorder.players += 1
+
+# --- Memory ---
+
+def rss_mb(pid):
+    """Resident memory of process `pid` in MB, or None if unknown."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def sample_memory(pid, samples, stop):
+    start = time.perf_counter()
+    while not stop.wait(MEMORY_SAMPLE_EVERY):
+        rss = rss_mb(pid)
+        if rss is not None:
+            samples.append((round(time.perf_counter() - start, 2), round(rss, 1)))
+
+# --- Driver ---
+
+def start_server():
+    """Run the app under `flask run` on a free localhost port; returns (process, port)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, FLASK_APP="app")
+    proc = subprocess.Popen([sys.executable, "-m", "flask", "run", "--host", "127.0.0.1",
+                             "--port", str(port), "--no-reload", "--with-threads"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60  # warming the predictor takes a moment
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("the server exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("the server did not start listening within 60s")
+
+def run_load(make_client, players=100, concurrency=10, rate=0.0, answers="uniform", think=0.0,
+             seed=0, server_pid=None):
+    """Run the players and return a report dict."""
+    weights = answers if isinstance(answers, str) and len(answers) == len(cg.QUESTIONS) \
+        else ANSWER_MODES[answers]
+    recorder, samples, stop = Recorder(), [], threading.Event()
+    monitor = threading.Thread(target=sample_memory, args=(server_pid, samples, stop), daemon=True)
+    monitor.start()
+    slots = threading.BoundedSemaphore(concurrency)
+    arrivals = random.Random(seed)
+
+    def player(number):
+        try:
+            play(make_client(), random.Random(f"{seed}:{number}"), recorder, weights, think)
+        finally:
+            slots.release()
+
+    threads = []
+    start = time.perf_counter()
+    for number in range(players):
+        if rate:
+            time.sleep(arrivals.expovariate(rate))
+        slots.acquire()
+        t = threading.Thread(target=player, args=(number,), daemon=True)
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    monitor.join()
+    rss = rss_mb(server_pid)
+    if rss is not None:
+        samples.append((round(elapsed, 2), round(rss, 1)))
+    return report(recorder, elapsed, samples)
+
+def report(recorder, elapsed, samples):
+    kinds, total, errors = {}, 0, 0
+    for kind, values in recorder.latencies.items():
+        values.sort()
+        total += len(values)
+        errors += recorder.errors[kind]
+        kinds[kind] = {"requests": len(values), "errors": recorder.errors[kind],
+                       "p50_ms": cli.percentile(values, 0.5) * 1e3,
+                       "p90_ms": cli.percentile(values, 0.9) * 1e3,
+                       "p99_ms": cli.percentile(values, 0.99) * 1e3, "max_ms": values[-1] * 1e3}
+    return {"players": recorder.players, "requests": total, "seconds": elapsed,
+            "requests_per_sec": total / elapsed if elapsed else 0.0,
+            "players_per_sec": recorder.players / elapsed if elapsed else 0.0,
+            "error_rate": errors / total if total else 0.0, "by_kind": kinds,
+            "memory_mb": samples}
+
+def print_report(r):
+    print(f"{r['players']} players, {r['requests']} requests in {r['seconds']:.1f}s: "
+          f"{r['requests_per_sec']:.0f} req/s, {r['players_per_sec']:.1f} players/s, "
+          f"{r['error_rate']:.2%} errors")
+    print(f"{'':12} {'requests':>9} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind, k in r["by_kind"].items():
+        print(f"{kind:12} {k['requests']:>9} {k['errors']:>7} {k['p50_ms']:>8.2f} {k['p90_ms']:>8.2f}"
+              f" {k['p99_ms']:>8.2f} {k['max_ms']:>8.2f}")
+    if r["memory_mb"]:
+        mem = r["memory_mb"]
+        shown = mem[::max(1, len(mem) // 10)]
+        if shown[-1] != mem[-1]:
+            shown.append(mem[-1])
+        print("server RSS (s: MB): " + ", ".join(f"{t}: {m}" for t, m in shown))
+
+def main():
+    proc = None
+    try:
+        players = cli.flag("--players", 100, int)
+        concurrency = cli.flag("--concurrency", 10, int)
+        rate = cli.flag("--rate", 0.0, float)
+        think = cli.flag("--think", 0.0, float)
+        seed = cli.flag("--seed", 0, int)
+        answers = cli.flag("--answers", "uniform")
+        if answers not in ANSWER_MODES and len(answers) != len(cg.QUESTIONS):
+            raise ValueError(f"--answers must be one of {', '.join(ANSWER_MODES)}"
+                             f" or a {len(cg.QUESTIONS)}-letter answer string")
+        url = cli.flag("--url", None)
+        if url:
+            parts = urlsplit(url)
+            if parts.hostname not in ("127.0.0.1", "localhost", "::1"):
+                raise ValueError("--url must point at localhost")
+            make_client = lambda: HTTPClient(parts.hostname, parts.port or 80)
+            server_pid = cli.flag("--pid", None, int)  # memory is only reported if given
+        elif "--serve" in sys.argv:
+            proc, port = start_server()
+            make_client = lambda: HTTPClient("127.0.0.1", port)
+            server_pid = proc.pid
+        else:
+            from app import app
+            make_client = lambda: WSGIClient(app)
+            server_pid = os.getpid()
+    except (ValueError, RuntimeError) as e:
+        print(f"error: {e}")
+        print("usage: loadgen.py [--url http://127.0.0.1:PORT [--pid PID] | --serve] [--players N] [--concurrency C]"
+              " [--rate PER_SEC] [--think SECONDS] [--answers uniform|first|skewed|LETTERS]"
+              " [--seed S] [--json]")
+        return 1
+    try:
+        result = run_load(make_client, players, concurrency, rate, answers, think, seed, server_pid)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    if "--json" in sys.argv:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 1 if result["error_rate"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Latency histograms for the web app, served in Prometheus text format.
+
+    FORGE_METRICS=1 python3 app.py
+    curl localhost:5000/metrics
+
+instrument(app) records:
+
+- forge_request_seconds{route}: each request, by the endpoint its URL rule maps to
+- forge_session_seconds{op}: loading ("open") and signing ("save") the cookie session
+- forge_session_bytes: size of the Cookie header each request sends
+- forge_render_seconds{template}: Jinja rendering
+- forge_synthesize_seconds{phase}: synthesize() split into clamp, class,
+  background, picks and summary, timed on one call in PHASE_SAMPLE_EVERY
+
+Nothing is installed unless instrument() is called, so a plain run pays
+nothing. Sampling the phases keeps the cost of an instrumented synthesize()
+to a counter bump on most calls. Observing takes no lock (see Histogram),
+which keeps a fully instrumented request within about 1% of its time.
+
+Under asgi.py, permalinks answered on the event loop never reach Flask;
+ForgeASGI records them through TimedWSGI.record() as route="character",
+so they land in the same histogram as the ones Flask serves.
+"""
+
+import itertools, threading, time
+from bisect import bisect_left
+from collections import deque
+
+from flask import Response
+from flask.sessions import SecureCookieSessionInterface
+from werkzeug.exceptions import HTTPException
+
+import character_generator as cg
+
+# Seconds; request and phase latencies both fall in here
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+           0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096)
+PHASE_SAMPLE_EVERY = 32
+ROUTE_CACHE_SIZE = 4096  # (method, path) -> histogram entries before starting over
+FOLD_EVERY = 256  # pending observations before they're added to the buckets
+
+class Histogram:
+    """Bucket counts, a sum and a count.
+
+    observe() only appends to a deque, which is atomic, so the request
+    path never waits on a lock; the pending values are folded into the
+    buckets FOLD_EVERY at a time and before every scrape.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        self._pending.append(value)
+        if len(self._pending) >= FOLD_EVERY:
+            self.fold()
+
+    def fold(self):
+        with self._lock:
+            # Only folders pop, one at a time, so at least this many are there
+            for _ in range(len(self._pending)):
+                value = self._pending.popleft()
+                self.counts[bisect_left(self.buckets, value)] += 1
+                self.sum += value
+                self.count += 1
+
+    def samples(self, name, labels):
+        """Prometheus text lines for this histogram."""
+        self.fold()
+        label = ",".join(f'{k}="{v}"' for k, v in labels)
+        sep = "," if label else ""
+        lines, running = [], 0
+        for bound, n in zip(self.buckets + ("+Inf",), self.counts):
+            running += n
+            lines.append(f'{name}_bucket{{{label}{sep}le="{bound}"}} {running}')
+        suffix = f"{{{label}}}" if label else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+class Registry:
+    """Histograms by (name, labels), created on first use."""
+
+    def __init__(self):
+        self.help = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help, buckets=BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram(buckets))
+                self.help.setdefault(name, help)
+        return hist
+
+    def render(self):
+        lines, seen = [], set()
+        for (name, labels), hist in sorted(self._histograms.items()):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            lines.extend(hist.samples(name, labels))
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def phase_sampler(registry=REGISTRY, every=PHASE_SAMPLE_EVERY):
+    """A character_generator.phase_timer that times one call in `every`."""
+    calls = itertools.count()
+    hists = {}
+
+    def start():
+        if next(calls) % every:
+            return None
+        last = [time.perf_counter()]
+
+        def mark(phase):
+            now = time.perf_counter()
+            hist = hists.get(phase)
+            if hist is None:
+                hist = hists[phase] = registry.histogram(
+                    "forge_synthesize_seconds", "synthesize() time by phase (sampled)", phase=phase)
+            hist.observe(now - last[0])
+            last[0] = now
+        return mark
+    return start
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+
+    def __init__(self, registry=REGISTRY):
+        help = "Cookie session load/sign time"
+        self._open = registry.histogram("forge_session_seconds", help, op="open")
+        self._save = registry.histogram("forge_session_seconds", help, op="save")
+
+    def open_session(self, app, request):
+        start = time.perf_counter()
+        session = super().open_session(app, request)
+        self._open.observe(time.perf_counter() - start)
+        return session
+
+    def save_session(self, app, session, response):
+        start = time.perf_counter()
+        super().save_session(app, session, response)
+        self._save.observe(time.perf_counter() - start)
+
+class TimedWSGI:
+    """WSGI wrapper timing each request by route.
+
+    Works on the raw environ only: going through Flask's request and g
+    proxies costs more than the timing itself. The route label is the
+    endpoint of the URL rule the request matches ("quiz", "character",
+    "api_forge_batch"...), or "unmatched" for 404s and 405s; matches are
+    cached per method and path. Streamed bodies are timed up to their
+    first byte.
+    """
+
+    def __init__(self, app, registry=REGISTRY):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.registry = registry
+        self.cookie_bytes = registry.histogram(
+            "forge_session_bytes", "Cookie header size sent by the client", SIZE_BUCKETS)
+        self._hists = {}
+        self._routes = {}
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            elapsed = time.perf_counter() - start
+            key = (environ.get("REQUEST_METHOD"), environ.get("PATH_INFO", "/"))
+            hist = self._hists.get(key)
+            if hist is None:
+                if len(self._hists) >= ROUTE_CACHE_SIZE:
+                    self._hists.clear()  # permalinks alone never repeat a path
+                hist = self._hists[key] = self.registry.histogram(
+                    "forge_request_seconds", "Request latency by route", route=self._route(environ))
+            hist.observe(elapsed)
+            self.cookie_bytes.observe(len(environ.get("HTTP_COOKIE", "")))
+
+    def record(self, route, elapsed, cookie_bytes):
+        """Count a request answered without going through the app, under `route`."""
+        hist = self._routes.get(route)
+        if hist is None:
+            hist = self._routes[route] = self.registry.histogram(
+                "forge_request_seconds", "Request latency by route", route=route)
+        hist.observe(elapsed)
+        self.cookie_bytes.observe(cookie_bytes)
+
+    def _route(self, environ):
+        try:
+            rule, _ = self.app.url_map.bind_to_environ(environ).match(return_rule=True)
+        except HTTPException:  # no rule, wrong method, or a slash redirect
+            return "unmatched"
+        return rule.endpoint
+
+def instrument(app, registry=REGISTRY):
+    """Record request, session, render and synthesize timings and serve /metrics."""
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    # A Template subclass rather than the before_render_template and
+    # template_rendered signals: dispatching those two costs more than the
+    # rest of the instrumentation together
+    hists = {}
+
+    class TimedTemplate(app.jinja_env.template_class):
+
+        def render(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().render(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                hist = hists.get(self.name)
+                if hist is None:
+                    hist = hists[self.name] = registry.histogram(
+                        "forge_render_seconds", "Template render time", template=self.name)
+                hist.observe(elapsed)
+
+    app.jinja_env.template_class = TimedTemplate
+    if app.jinja_env.cache is not None:
+        app.jinja_env.cache.clear()  # anything already loaded was built from the old class
+    app.session_interface = TimedSessionInterface(registry)
+    app.wsgi_app = app.extensions["forge_metrics"] = TimedWSGI(app, registry)
+    cg.phase_timer = phase_sampler(registry)
+    return registry
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Exact outcome distributions for the Character Forge quiz.
+
+Answers every "how often does X come out?" question without sampling:
+    python3 outcomes.py                 # class / background / tone odds
+    python3 outcomes.py --workers 4     # same, split across processes
+    python3 outcomes.py --json          # machine-readable output
+
+Every one of the 5^18 answer paths is weighted equally, stats are clamped
+after every question (as in the interactive game), and the synthesize()
+tiebreak dice are folded in exactly, so the probabilities are exact
+fractions of (answer paths x tiebreak rolls).
+
+Instead of enumerating paths, a dynamic program walks the questions and
+keeps only the distinct reachable stat vectors with their path counts.
+Vectors are quantized first: once a stat is at or above its highest rule
+threshold (plus whatever later questions could still take away) its exact
+value can no longer change any outcome, so all such values merge. That
+keeps every step to ~1e5 states instead of millions.
+"""
+
+import json, sys, time
+from functools import lru_cache
+from multiprocessing import Pool
+
+import numpy as np
+
+import character_generator as cg
+import cli
+
+_STRIDES = [cg.STAT_RADIX ** (len(cg.STAT_KEYS) - 1 - i) for i in range(len(cg.STAT_KEYS))]
+
+# --- Quantization ---
+
+def _feature_caps():
+    # Highest threshold any rule checks per stat; above it values are equivalent
+    caps = {k: cg.STAT_MIN for k in cg.STAT_KEYS}
+    for k, n in cg.FEATURES:
+        caps[k] = max(caps[k], n)
+    return caps
+
+def _option_deltas(question):
+    return [delta for _, (_, delta) in sorted(question["opts"].items())]
+
+@lru_cache(maxsize=None)
+def stat_caps(step, ceiling=None):
+    """Per-stat quantization cap for states after `step` answered questions.
+
+    A `ceiling` keeps every stat exact up to at least that value, for
+    trying thresholds higher than the current rules use (see tune.py).
+    """
+    caps = _feature_caps()
+    if ceiling is not None:
+        caps = {k: max(cap, ceiling) for k, cap in caps.items()}
+    for q in cg.QUESTIONS[step:]:
+        for k in cg.STAT_KEYS:
+            # the most a later answer can take away keeps the cap that much higher
+            drop = max(-delta.get(k, 0) for delta in _option_deltas(q))
+            caps[k] += max(drop, 0)
+    return [min(caps[k], cg.STAT_MAX) for k in cg.STAT_KEYS]
+
+def quantize(stats, step, ceiling=None):
+    """Pack clamped stats into the quantized state id used after `step` answers."""
+    caps = stat_caps(step, ceiling)
+    return cg.pack_stats({k: min(stats[k], cap) for k, cap in zip(cg.STAT_KEYS, caps)})
+
+@lru_cache(maxsize=None)
+def _transitions(step, ceiling=None):
+    # For question `step`, one list per option of (stride, increment table):
+    # state += table[digit] moves a digit to its clamped, re-quantized value
+    before, after = stat_caps(step, ceiling), stat_caps(step + 1, ceiling)
+    moves = []
+    for delta in _option_deltas(cg.QUESTIONS[step]):
+        option = []
+        for i, k in enumerate(cg.STAT_KEYS):
+            d = delta.get(k, 0)
+            if d == 0 and after[i] == before[i]:
+                continue
+            digits = np.arange(cg.STAT_RADIX)
+            values = np.minimum(np.clip(digits + cg.STAT_MIN + d, cg.STAT_MIN, cg.STAT_MAX), after[i])
+            option.append((_STRIDES[i], (values - cg.STAT_MIN - digits) * _STRIDES[i]))
+        moves.append(option)
+    return moves
+
+# --- Dynamic program over reachable states ---
+
+def _merge(states, counts):
+    # Sum the counts of equal states; counts stay exact int64 path counts
+    order = np.argsort(states, kind="stable")
+    states, counts = states[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, states[1:] != states[:-1]])
+    return states[starts], np.add.reduceat(counts, starts)
+
+def successors(states, step, ceiling=None):
+    """One array per option of question `step`: where each state moves to."""
+    next_states = []
+    for option in _transitions(step, ceiling):
+        moved = states.copy()
+        for stride, table in option:
+            moved += table[(states // stride) % cg.STAT_RADIX]
+        next_states.append(moved)
+    return next_states
+
+def advance(states, counts, step, ceiling=None):
+    """Distribution after question `step` given the one before it."""
+    next_states = successors(states, step, ceiling)
+    return _merge(np.concatenate(next_states), np.concatenate([counts] * len(next_states)))
+
+def start_distribution(ceiling=None):
+    return np.array([quantize(cg.init_stats(), 0, ceiling)], dtype=np.int64), np.ones(1, dtype=np.int64)
+
+@lru_cache(maxsize=None)
+def state_distribution(step, ceiling=None):
+    """(state ids, path counts) after `step` answers; memoized per step.
+
+    State ids are quantized packed stats (see quantize); counts sum to
+    options ** step.
+    """
+    if step == 0:
+        return start_distribution(ceiling)
+    return advance(*state_distribution(step - 1, ceiling), step - 1, ceiling)
+
+def run_from(states, counts, step, stop=None, ceiling=None):
+    """Walk a distribution from `step` to `stop` (default: the last question)."""
+    stop = len(cg.QUESTIONS) if stop is None else stop
+    for s in range(step, stop):
+        states, counts = advance(states, counts, s, ceiling)
+    return states, counts
+
+# --- Folding in the synthesize() tiebreak ---
+
+@lru_cache(maxsize=None)
+def tiebreak_wins(base):
+    """How many of the spread ** len(base) tiebreak rolls each entry wins.
+
+    Mirrors synthesize(): entry i scores base[i] + roll and the first
+    maximum wins, so earlier entries must stay strictly below it.
+    """
+    spread = cg.TIEBREAK_SPREAD
+    wins = []
+    for i, b in enumerate(base):
+        total = 0
+        for roll in range(spread):
+            score = b + roll
+            ways = 1
+            for j, other in enumerate(base):
+                if j == i:
+                    continue
+                limit = score - other if j < i else score - other + 1
+                ways *= min(max(limit, 0), spread)
+                if not ways:
+                    break
+            total += ways
+        wins.append(total)
+    return tuple(wins)
+
+def tiebreak_table(rows):
+    """tiebreak_wins() for every row of a 2-D array of base scores at once."""
+    rows = np.asarray(rows, dtype=np.int64)
+    spread = cg.TIEBREAK_SPREAD
+    later = np.arange(rows.shape[1])
+    wins = np.zeros(rows.shape, dtype=np.int64)
+    for i in range(rows.shape[1]):
+        for roll in range(spread):
+            # entries after i may tie it, entries before it must stay below
+            ways = np.clip(rows[:, i:i + 1] + roll - rows + (later > i), 0, spread)
+            ways[:, i] = 1
+            wins[:, i] += ways.prod(axis=1)
+    return wins
+
+def unique_rows(rows):
+    """np.unique(rows, axis=0, return_inverse=True), via one packed key per row."""
+    low = int(rows.min(initial=0))
+    span = int(rows.max(initial=0)) - low + 1
+    if span ** rows.shape[1] >= 2 ** 63:
+        unique, inverse = np.unique(rows, axis=0, return_inverse=True)
+        return unique, inverse.ravel()
+    keys = np.zeros(len(rows), dtype=np.int64)
+    for column in rows.T:
+        keys = keys * span + (column - low)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return rows[first], inverse.ravel()
+
+def dense_index(states):
+    """Index of each state into the dense tables used by synthesize_batch."""
+    offsets = cg._get_batch_tables()["offsets"]
+    index = np.zeros(len(states), dtype=np.intp)
+    for i, stride in enumerate(_STRIDES):
+        index += offsets[i][(states // stride) % cg.STAT_RADIX]
+    return index
+
+def fold(states, counts):
+    """Exact outcome weights (Python ints) for a final-state distribution.
+
+    Returns {"class": [...], "background": [...], "tone": [...]} aligned with
+    CLASSES, BACKGROUND_NAMES and TONES, plus "total" for the denominator.
+    """
+    tables = cg._get_batch_tables()
+    keys, counts = _merge(dense_index(states).astype(np.int64), counts)
+    spread = cg.TIEBREAK_SPREAD
+    n_cls, n_bg = len(cg.CLASSES), len(cg.BACKGROUND_NAMES)
+    # class and background rolls are independent, so each marginal is
+    # scaled by the other's roll count to share one denominator
+    result = {
+        "class": _fold_scores(tables["class"][keys], counts, spread ** n_bg),
+        "background": _fold_scores(tables["background"][keys], counts, spread ** n_cls),
+        "tone": [0] * len(cg.TONES),
+    }
+    tones = tables["tone"][keys]
+    for t in range(len(cg.TONES)):
+        result["tone"][t] = int(counts[tones == t].sum()) * spread ** (n_cls + n_bg)
+    result["total"] = int(counts.sum()) * spread ** (n_cls + n_bg)
+    return result
+
+def _fold_scores(base_rows, counts, scale):
+    # Few distinct base-score rows exist, so solve the tiebreak once per row
+    rows, inverse = unique_rows(base_rows)
+    row_counts = np.zeros(len(rows), dtype=np.int64)
+    np.add.at(row_counts, inverse, counts)
+    totals = [0] * base_rows.shape[1]
+    for wins, count in zip(tiebreak_table(rows).tolist(), row_counts.tolist()):
+        for i, w in enumerate(wins):
+            totals[i] += count * w * scale
+    return totals
+
+def final_class_odds(states):
+    """Class probabilities (rows aligned with CLASSES) for final states."""
+    rows = cg._get_batch_tables()["class"][dense_index(states)]
+    unique, inverse = unique_rows(rows)
+    return tiebreak_table(unique)[inverse] / cg.TIEBREAK_SPREAD ** len(cg.CLASSES)
+
+def class_odds(step, state):
+    """Class probabilities from one quantized state after `step` answers,
+    averaged over every way of answering the remaining questions."""
+    states, counts = run_from(np.array([state], dtype=np.int64), np.ones(1, dtype=np.int64), step)
+    return tuple((counts @ final_class_odds(states) / counts.sum()).tolist())
+
+def class_odds_layers():
+    """Yield (step, states, odds) from the last question back to the first.
+
+    odds[i] is class_odds(step, states[i]) for every reachable state, found by
+    averaging the next layer's rows over each question's options, so the
+    whole sweep costs about as much as one pass of the forward program.
+    """
+    step = len(cg.QUESTIONS)
+    states = state_distribution(step)[0]
+    odds = final_class_odds(states)
+    yield step, states, odds
+    for step in range(step - 1, -1, -1):
+        following = states
+        states = state_distribution(step)[0]
+        moved = successors(states, step)
+        odds = sum(odds[np.searchsorted(following, m)] for m in moved) / len(moved)
+        yield step, states, odds
+
+# --- Public entry points ---
+
+def _fold_chunk(args):
+    states, counts, step = args
+    return fold(*run_from(states, counts, step))
+
+def _add(a, b):
+    return {k: [x + y for x, y in zip(a[k], b[k])] if k != "total" else a[k] + b[k] for k in a}
+
+def outcome_distribution(workers=1, split_step=3):
+    """Exact class / background / tone probabilities over the whole bank.
+
+    With workers > 1 the states after `split_step` answers are dealt out to
+    a process pool; each worker runs the rest of the quiz for its share and
+    the exact weights are summed.
+    """
+    if workers <= 1:
+        weights = fold(*state_distribution(len(cg.QUESTIONS)))
+    else:
+        split_step = min(split_step, len(cg.QUESTIONS))
+        states, counts = state_distribution(split_step)
+        # contiguous id ranges share high digits, so their descendants overlap
+        # within a worker rather than being recomputed across workers
+        bounds = np.linspace(0, len(states), workers + 1).astype(int)
+        jobs = [(states[a:b], counts[a:b], split_step) for a, b in zip(bounds, bounds[1:])]
+        with Pool(workers) as pool:
+            parts = pool.map(_fold_chunk, jobs)
+        weights = parts[0]
+        for part in parts[1:]:
+            weights = _add(weights, part)
+    return probabilities(weights)
+
+def probabilities(weights):
+    total = weights["total"]
+    return {
+        "class": {c: w / total for c, w in zip(cg.CLASSES, weights["class"])},
+        "background": {b: w / total for b, w in zip(cg.BACKGROUND_NAMES, weights["background"])},
+        "tone": {t: w / total for t, w in zip(cg.TONES, weights["tone"])},
+    }
+
+def print_report(dist):
+    for section in ("class", "background", "tone"):
+        print(f"\n{section.title()} odds")
+        print("-" * 32)
+        for name, p in sorted(dist[section].items(), key=lambda x: -x[1]):
+            print(f"  {name:16} {p:8.4%}")
+    print()
+
+def main():
+    try:
+        workers = cli.flag("--workers", 1, int)
+    except ValueError as e:
+        print(f"error: {e}")
+        print("usage: outcomes.py [--workers N] [--json]")
+        return 1
+    start = time.perf_counter()
+    dist = outcome_distribution(workers=workers)
+    elapsed = time.perf_counter() - start
+    if "--json" in sys.argv:
+        print(json.dumps(dist, indent=2))
+    else:
+        print_report(dist)
+    print(f"{len(cg.QUESTIONS)} questions, exact over all answer paths in {elapsed:.2f}s",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Party mode: forge whole adventuring parties under constraints.
+
+    from party import generate_parties
+    for p in generate_parties(10_000, size=4, min_roles={"healer": 1}, workers=4):
+        ...
+
+Also available as `python3 character_generator.py --party N` and the
+/party route of the web app.
+
+Random quiz runs almost never give, say, a Monk (about 1 run in 200,000),
+so rejection sampling over quick_demo-style runs stalls on tight
+constraints. Instead each party first picks a class line-up that meets the
+constraints, then forges every member from answer sets reverse_search
+found for that class. Only the seed is left to chance, and a few tries
+land the class with a quirk nobody else in the party has yet; a member
+still missing after DRAWS archetypes is a ValueError, not an endless loop.
+
+Every party draws from its own random stream, seeded from
+(base_seed, party number), so a party comes out the same whichever
+worker builds it.
+"""
+
+import random
+from multiprocessing import Pool
+
+import character_generator as cg
+import reverse_search
+
+ROLES = {
+    "healer": ["Cleric", "Druid", "Bard", "Paladin"],
+    "frontline": ["Fighter", "Barbarian", "Paladin", "Monk"],
+    "skirmisher": ["Rogue", "Ranger", "Monk"],
+    "caster": ["Wizard", "Sorcerer", "Warlock", "Druid"],
+}
+
+ARCHETYPES_PER_CLASS = 8
+SEED_TRIES = 2000
+DRAWS = 16  # archetypes tried per member before giving up, SEED_TRIES seeds each
+
+_archetypes = {}
+
+def archetypes(cls):
+    """Answer strings (with their odds) that can forge `cls`, found once per process."""
+    if cls not in _archetypes:
+        found = reverse_search.find_answers({"class": cls}, count=ARCHETYPES_PER_CLASS,
+                                            seeds=range(SEED_TRIES))
+        _archetypes[cls] = [(s["answers"], s["odds"]) for s in found]
+    return _archetypes[cls]
+
+def check_constraints(size, distinct_classes, min_roles, unique_quirks):
+    if size < 1:
+        raise ValueError("a party needs at least one member")
+    if distinct_classes and size > len(cg.CLASSES):
+        raise ValueError(f"only {len(cg.CLASSES)} classes for {size} distinct members")
+    if unique_quirks and size > len(cg.QUIRKS):
+        raise ValueError(f"only {len(cg.QUIRKS)} quirks for {size} members")
+    for role, n in min_roles.items():
+        if role not in ROLES:
+            raise ValueError(f"unknown role {role!r}; pick one of {', '.join(ROLES)}")
+    if sum(min_roles.values()) > size:
+        raise ValueError("role minimums add up to more than the party size")
+
+def pick_lineup(rng, size, distinct_classes=True, min_roles=None):
+    """Classes for one party, meeting the role minimums first."""
+    lineup = []
+    for role, n in (min_roles or {}).items():
+        have = sum(1 for c in lineup if c in ROLES[role])
+        options = [c for c in ROLES[role] if not (distinct_classes and c in lineup)]
+        if have < n and len(options) < n - have:
+            raise ValueError(f"not enough distinct classes left for {n} {role}(s)")
+        for _ in range(n - have):
+            cls = rng.choice(options)
+            lineup.append(cls)
+            if distinct_classes:
+                options.remove(cls)
+    rest = [c for c in cg.CLASSES if not (distinct_classes and c in lineup)]
+    while len(lineup) < size:
+        cls = rng.choice(rest)
+        lineup.append(cls)
+        if distinct_classes:
+            rest.remove(cls)
+    rng.shuffle(lineup)
+    return lineup
+
+def forge_member(rng, cls, taken_quirks=()):
+    """A character of class `cls` whose quirk is not in `taken_quirks`."""
+    pool = archetypes(cls)
+    if not pool:
+        raise ValueError(f"no answers can forge a {cls}")
+    for _ in range(DRAWS):
+        answers, _ = rng.choices(pool, weights=[odds for _, odds in pool])[0]
+        stats = reverse_search.replay(answers)
+        for _ in range(SEED_TRIES):
+            seed = rng.getrandbits(31)
+            char = cg.synthesize(stats, seed=seed)
+            if char["class"] == cls and char["quirk"] not in taken_quirks:
+                char["answers"], char["seed"] = answers, seed
+                return char
+    raise ValueError(f"no {cls} with a free quirk in {DRAWS * SEED_TRIES} tries")
+
+def forge_party(number, base_seed=0, size=4, distinct_classes=True, min_roles=None,
+                unique_quirks=True):
+    rng = random.Random(f"{base_seed}:{number}")
+    members, quirks = [], set()
+    for cls in pick_lineup(rng, size, distinct_classes, min_roles):
+        char = forge_member(rng, cls, quirks if unique_quirks else ())
+        quirks.add(char["quirk"])
+        members.append(char)
+    return {"party": number, "members": members}
+
+def _forge_job(args):
+    found, job = args
+    _archetypes.update(found)  # no-op after a worker's first job
+    return forge_party(*job)
+
+def generate_parties(count, size=4, distinct_classes=True, min_roles=None, unique_quirks=True,
+                     base_seed=0, workers=1):
+    """Yield `count` parties as they are finished.
+
+    With workers > 1 parties come from a process pool and arrive in
+    completion order; each carries its "party" number, and its contents
+    depend only on (base_seed, number).
+    """
+    min_roles = {"healer": 1} if min_roles is None else min_roles
+    check_constraints(size, distinct_classes, min_roles, unique_quirks)
+    jobs = ((i, base_seed, size, distinct_classes, min_roles, unique_quirks) for i in range(count))
+    if workers <= 1:
+        for job in jobs:
+            yield forge_party(*job)
+        return
+    with Pool(workers) as pool:
+        # Searching each class's archetypes is most of the work for a few
+        # thousand parties, so the classes are spread over the pool too and
+        # the results handed to every worker with its jobs
+        found = dict(zip(cg.CLASSES, pool.map(archetypes, cg.CLASSES, chunksize=1)))
+        yield from pool.imap_unordered(_forge_job, ((found, job) for job in jobs), chunksize=16)
+
+def party_summary(party):
+    lines = [f"--- Party {party['party'] + 1} ---"]
+    for char in party["members"]:
+        lines.append(f"  {char['race suggestion']} {char['class']} ({char['subclass suggestion']}),"
+                     f" {char['background']}. {char['quirk']}")
+    return "\n".join(lines)
@@ -0,0 +1,70 @@
+"""
+Live "likely class" predictions for the web quiz.
+
+After some answers, the odds of each class are averaged over every way of
+answering the remaining questions (see outcomes.py). Results are cached
+per (question index, quantized stats) in a bounded LRU, so a repeat lookup
+is a dict hit. warm() fills the early questions, where a cold lookup would
+have to walk almost the whole bank, in one backward sweep.
+
+Given mapped shared tables (see shared_tables.py), lookups read the
+precomputed odds for every state straight from them instead, and nothing
+needs warming.
+"""
+
+import character_generator as cg
+import outcomes as oc
+from forge_cache import LRUCache
+
+class ClassPredictor:
+
+    def __init__(self, maxsize=50_000, tables=None):
+        self.cache = LRUCache(maxsize)
+        self.tables = tables
+        self.table_hits = 0
+
+    def predict(self, qid, stats):
+        """Class -> probability given `qid` answered questions and their stats."""
+        stats = cg.clamp_stats({k: stats.get(k, 0) for k in cg.STAT_KEYS})
+        key = (qid, oc.quantize(stats, qid))
+        if self.tables is not None:
+            row = self.tables.class_odds(*key)
+            if row is not None:
+                self.table_hits += 1
+                return dict(zip(cg.CLASSES, row.tolist()))
+        odds = self.cache.get(key)
+        if odds is None:
+            odds = oc.class_odds(*key)
+            self.cache.put(key, odds)
+        return dict(zip(cg.CLASSES, odds))
+
+    def top(self, qid, stats, n=3):
+        odds = self.predict(qid, stats)
+        return sorted(odds.items(), key=lambda x: -x[1])[:n]
+
+    def warm(self, budget=None):
+        """Precompute every reachable state of the earliest questions.
+
+        Fills whole question steps, earliest first, while they fit in
+        `budget` entries (default: half the cache). Returns entries added.
+        """
+        if self.tables is not None:
+            return 0
+        budget = self.cache.maxsize // 2 if budget is None else budget
+        sizes = [len(oc.state_distribution(step)[0]) for step in range(len(cg.QUESTIONS) + 1)]
+        last = -1
+        while last + 1 < len(sizes) and sum(sizes[:last + 2]) <= budget:
+            last += 1
+        added = 0
+        for step, states, odds in oc.class_odds_layers():
+            if step <= last:
+                for state, row in zip(states.tolist(), odds.tolist()):
+                    self.cache.put((step, state), tuple(row))
+                added += len(states)
+        return added
+
+    def stats(self):
+        stats = self.cache.stats()
+        if self.tables is not None:
+            stats.update(tables=self.tables.path, table_hits=self.table_hits)
+        return stats
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Reverse search: which answers forge a given character?
+
+    python3 reverse_search.py --class Warlock --background Sage --race Gnome
+    python3 reverse_search.py --class Monk --tone bold --count 5
+
+Prints answer strings (one letter per question, e.g. "abdce...") plus a
+seed for synthesize() that lands the requested class, background, race
+and so on.
+
+Trying all 5^18 answer paths is out of the question, so the question list
+is split in two (meet in the middle):
+
+- the first half is walked forward from the starting stats, keeping one
+  answer prefix per distinct (quantized) stat vector, as in outcomes.py;
+- the second half is walked as stat *deltas*, keeping one answer suffix per
+  distinct delta vector, along with each stat's lowest running total so
+  pairings that would hit the clamp_stats floor can be pruned;
+- the rule-table cells the target can come out of are then taken best
+  odds first (skipping the ones no answer path reaches), and prefixes and
+  suffixes whose exact sum lands in the cell are paired up;
+- each pair is checked for real: answers replayed, then seeds tried until
+  synthesize() agrees, giving up after a few times the seeds its odds
+  say it needs and coming back to it only once the others have been tried.
+"""
+
+import math, sys, time
+from functools import lru_cache
+
+import numpy as np
+
+import character_generator as cg
+import outcomes as oc
+
+# CLI flag -> character dict field
+FIELDS = {
+    "class": "class",
+    "subclass": "subclass suggestion",
+    "background": "background",
+    "race": "race suggestion",
+    "alignment": "alignment",
+    "tone": "tone",
+}
+
+_DELTA_RADIX = 32  # packed delta digits, offset by half the radix
+SEED_MARGIN = 4  # seed tries per candidate before moving on, in multiples of 1 / its odds
+
+def _letters(step):
+    return sorted(cg.QUESTIONS[step]["opts"])
+
+def _code_radix():
+    return max(len(q["opts"]) for q in cg.QUESTIONS)
+
+def _decode(code, start, stop):
+    radix, letters = _code_radix(), []
+    for step in range(stop - 1, start - 1, -1):
+        code, o = divmod(code, radix)
+        letters.append(_letters(step)[o])
+    return "".join(reversed(letters))
+
+def _dedupe(keys, codes, *columns):
+    # Keep the first row of every distinct key
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    first = np.r_[True, keys[1:] != keys[:-1]]
+    return (keys[first], codes[order][first]) + tuple(c[order][first] for c in columns)
+
+# --- The two halves ---
+
+@lru_cache(maxsize=None)
+def _walk(split):
+    """Distinct quantized states after `split` answers, with one prefix code each."""
+    states, _ = oc.start_distribution()
+    codes = np.zeros(1, dtype=np.int64)
+    radix = _code_radix()
+    for step in range(split):
+        moved = oc.successors(states, step)
+        states = np.concatenate(moved)
+        codes = np.concatenate([codes * radix + o for o in range(len(moved))])
+        states, codes = _dedupe(states, codes)
+    return states, codes
+
+@lru_cache(maxsize=None)
+def _front(split):
+    """Distinct quantized stat vectors after `split` answers, one prefix each."""
+    states, codes = _walk(split)
+    values = np.stack([(states // stride) % cg.STAT_RADIX for stride in oc._STRIDES], axis=1)
+    return (values + cg.STAT_MIN).astype(np.int16), codes
+
+@lru_cache(maxsize=None)
+def _back(split):
+    """Distinct capped delta vectors of the answers after `split`, one suffix each.
+
+    Returns (deltas, lowest running totals, suffix codes). A delta only
+    matters up to the distance from the lowest first-half value to the
+    highest rule threshold, plus what later answers can still take away,
+    so larger totals are capped there and merge.
+    """
+    caps = oc._feature_caps()
+    floor = _front(split)[0].min(axis=0)
+    reach = np.array([caps[k] for k in cg.STAT_KEYS], dtype=np.int16) - floor
+    n = len(cg.QUESTIONS)
+    deltas = np.zeros((1, len(cg.STAT_KEYS)), dtype=np.int16)
+    lowest = np.zeros_like(deltas)
+    codes = np.zeros(1, dtype=np.int64)
+    radix = _code_radix()
+    for step in range(split, n):
+        cap = reach + np.array(oc.stat_caps(step + 1)) - np.array(oc.stat_caps(n))
+        options = [np.array([d.get(k, 0) for k in cg.STAT_KEYS], dtype=np.int16)
+                   for d in oc._option_deltas(cg.QUESTIONS[step])]
+        moved = [np.minimum(deltas + d, cap) for d in options]
+        lowest = np.concatenate([np.minimum(lowest, m) for m in moved])
+        deltas = np.concatenate(moved)
+        codes = np.concatenate([codes * radix + o for o in range(len(options))])
+        keys = _pack_deltas(deltas) * _DELTA_RADIX ** 2 + _pack_lowest(lowest)
+        _, codes, deltas, lowest = _dedupe(keys, codes, deltas, lowest)
+    return deltas, lowest, codes
+
+def _pack_deltas(deltas):
+    key = np.zeros(len(deltas), dtype=np.int64)
+    for column in deltas.T:
+        key = key * _DELTA_RADIX + column + _DELTA_RADIX // 2
+    return key
+
+def _pack_lowest(lowest):
+    # Only stats some answer lowers ever go below zero, so pack those alone
+    key = np.zeros(len(lowest), dtype=np.int64)
+    for column in lowest.T[(lowest < 0).any(axis=0)]:
+        key = key * _DELTA_RADIX - column
+    return key
+
+# --- Targets ---
+
+def _matches(char, constraints):
+    for field, wanted in constraints.items():
+        value = char[field]
+        if value != wanted and not value.lower().startswith(wanted.lower()):
+            return False
+    return True
+
+def target_odds(constraints):
+    """Chance, per dense rule-table index, that the stat-driven fields match.
+
+    Class and background odds come from the tiebreak; tone is fixed by the
+    stats. Fields that only depend on the seed (race, alignment...) are
+    left to the seed search.
+    """
+    tables = cg._get_batch_tables()
+    odds = np.ones(len(tables["tone"]))
+    for field, names, table in (("class", cg.CLASSES, tables["class"]),
+                                ("background", cg.BACKGROUND_NAMES, tables["background"])):
+        if field in constraints:
+            i = names.index(constraints[field])
+            rows, inverse = oc.unique_rows(table)
+            wins = oc.tiebreak_table(rows)[:, i]
+            odds *= wins[inverse] / cg.TIEBREAK_SPREAD ** table.shape[1]
+    if "tone" in constraints:
+        odds *= tables["tone"] == cg.TONES.index(constraints["tone"])
+    return odds
+
+def _check(constraints):
+    for field, value in constraints.items():
+        if field not in FIELDS.values():
+            raise ValueError(f"can't search on {field!r}")
+    for field, names in (("class", cg.CLASSES), ("background", cg.BACKGROUND_NAMES),
+                         ("tone", cg.TONES)):
+        if field in constraints and constraints[field] not in names:
+            raise ValueError(f"unknown {field} {constraints[field]!r}; pick one of {', '.join(names)}")
+
+def seed_odds(constraints):
+    """Rough chance that a random seed gives the fields only the seed decides
+    (race, alignment, subclass), from the share of each pool that matches."""
+    p = 1.0
+    pools = {"race suggestion": cg.RACE_SUGGESTIONS, "alignment": cg.ALIGNMENTS}
+    if "class" in constraints:
+        pools["subclass suggestion"] = cg.SUBCLASS_SUGGESTIONS.get(constraints["class"], ["Any"])
+    for field, pool in pools.items():
+        if field in constraints:
+            p *= sum(_matches({field: value}, {field: constraints[field]}) for value in pool) / len(pool)
+    return p
+
+@lru_cache(maxsize=None)
+def reachable_cells(split):
+    """Dense rule-table indexes some answer path ends on.
+
+    Most cells with good odds can't be reached at all; skipping them keeps
+    the best-odds-first search from pairing the halves for nothing. The
+    first half's states are walked on to the end, keeping distinct states
+    only (no path counts, unlike outcomes.py).
+    """
+    states = _walk(split)[0]
+    for step in range(split, len(cg.QUESTIONS)):
+        states = np.sort(np.concatenate(oc.successors(states, step)))
+        states = states[np.r_[True, states[1:] != states[:-1]]]
+    cells = np.sort(oc.dense_index(states))
+    return cells[np.r_[True, cells[1:] != cells[:-1]]]
+
+def allowed_values(feasible):
+    """Per stat, which final values (index v - STAT_MIN) the dense rule-table indexes `feasible` use."""
+    offsets = cg._get_batch_tables()["offsets"]
+    feasible = np.asarray(feasible)
+    allowed = []
+    for row in offsets:
+        steps = sorted(set(row.tolist()))
+        if len(steps) == 1:  # no rule looks at this stat
+            allowed.append(np.ones(len(row), dtype=bool))
+            continue
+        stride = steps[1]
+        used = ((feasible // stride) % len(steps)) * stride
+        allowed.append(np.isin(row, used))
+    return allowed
+
+def _prune(front, deltas, caps, allowed):
+    # Per stat, drop prefix values that no suffix can lift into an allowed
+    # final value, and suffix deltas no prefix can use; then repeat once
+    # with the survivors, since each side's pruning tightens the other
+    keep_front = np.ones(len(front), dtype=bool)
+    keep_back = np.ones(len(deltas), dtype=bool)
+    for _ in range(2):
+        for s in range(front.shape[1]):
+            values = np.unique(front[keep_front, s])
+            moves = np.unique(deltas[keep_back, s])
+            hits = allowed[s][np.clip(values[:, None] + moves[None, :], cg.STAT_MIN, caps[s]) - cg.STAT_MIN]
+            keep_front &= np.isin(front[:, s], values[hits.any(axis=1)])
+            keep_back &= np.isin(deltas[:, s], moves[hits.any(axis=0)])
+    return keep_front, keep_back
+
+# --- Search ---
+
+def replay(answers):
+    """Stats after answering with `answers`, clamped after every question."""
+    stats = cg.init_stats()
+    for q, choice in zip(cg.QUESTIONS, answers):
+        for k, v in q["opts"][choice][1].items():
+            stats[k] = stats.get(k, 0) + v
+        cg.clamp_stats(stats)
+    return stats
+
+def search(constraints, seeds=range(200_000), min_odds=0.0, split=None):
+    """Yield {"answers", "seed", "stats", "odds", "character"} solutions.
+
+    `constraints` maps character fields ("class", "background", "race
+    suggestion", ...) to wanted values; pool entries also match by prefix,
+    so "Elf" finds "Elf (High/Eladrin/Drow flavor)". `odds` is the chance
+    a random seed would give the stat-driven fields for those answers.
+
+    Candidates come best odds first, and each gets about SEED_MARGIN times
+    the seeds it should need from the sequence `seeds` before the search
+    moves on; the ones that ran out are tried again with the rest of
+    `seeds` once every candidate has had its turn.
+    """
+    _check(constraints)
+    n = len(cg.QUESTIONS)
+    # delta vectors merge far less than capped stat vectors, so the back part
+    # is kept to the last third of the questions
+    split = n - n // 3 if split is None else split
+    odds_table = target_odds(constraints)
+    cells = np.intersect1d(np.flatnonzero(odds_table > min_odds), reachable_cells(split))
+    caps = np.array([oc._feature_caps()[k] for k in cg.STAT_KEYS], dtype=np.int16)
+    front, front_codes = _front(split)
+    deltas, lowest, back_codes = _back(split)
+    keep_front, keep_back = _prune(front, deltas, caps, allowed_values(cells))
+    front, front_codes = front[keep_front], front_codes[keep_front]
+    deltas, lowest, back_codes = deltas[keep_back], lowest[keep_back], back_codes[keep_back]
+    if not len(front) or not len(deltas):
+        return
+
+    seen, deferred = set(), []
+    per_seed = seed_odds(constraints)
+    paired = np.zeros(len(deltas), dtype=bool)
+    # Rule-table cells from best odds down: a delta's first pairing is its best
+    for cell in cells[np.argsort(-odds_table[cells], kind="stable")].tolist():
+        odds = float(odds_table[cell])
+        for f, r in _pairs(front, deltas, lowest, caps, allowed_values([cell]), ~paired):
+            paired[r] = True
+            answers = _decode(int(front_codes[f]), 0, split) + _decode(int(back_codes[r]), split, n)
+            if answers in seen:
+                continue
+            seen.add(answers)
+            stats = replay(answers)
+            tries = math.ceil(SEED_MARGIN / (odds * per_seed)) if per_seed else len(seeds)
+            solution = _seed_search(answers, stats, odds, seeds[:tries], constraints)
+            if solution:
+                yield solution
+            elif tries < len(seeds):
+                deferred.append((answers, stats, odds, tries))
+        if paired.all():
+            break
+    for answers, stats, odds, tries in deferred:
+        solution = _seed_search(answers, stats, odds, seeds[tries:], constraints)
+        if solution:
+            yield solution
+
+def _pairs(front, deltas, lowest, caps, allowed, open_deltas):
+    """(front row, delta row) pairs whose exact sum lands on the `allowed` values of every stat.
+
+    One pair per delta among `open_deltas`.
+    """
+    keep_front, keep_back = _prune(front, deltas, caps, allowed)
+    rows_front, rows_back = np.flatnonzero(keep_front), np.flatnonzero(keep_back & open_deltas)
+    sub = front[rows_front]
+    for r in rows_back.tolist():
+        # clamp prune: the sum is only exact if no running total hits the floor
+        hit = (sub + lowest[r] >= cg.STAT_MIN).all(axis=1)
+        final = np.clip(sub + deltas[r], cg.STAT_MIN, caps) - cg.STAT_MIN
+        for s in range(len(cg.STAT_KEYS)):
+            hit &= allowed[s][final[:, s]]
+        if hit.any():
+            yield int(rows_front[hit.argmax()]), r
+
+def _seed_search(answers, stats, odds, seeds, constraints):
+    for seed in seeds:
+        char = cg.synthesize(stats, seed=seed)
+        if _matches(char, constraints):
+            return {"answers": answers, "seed": seed, "stats": stats, "odds": odds, "character": char}
+    return None
+
+def find_answers(constraints, count=1, **kwargs):
+    """Up to `count` solutions from search(), as a list."""
+    found = []
+    for solution in search(constraints, **kwargs):
+        found.append(solution)
+        if len(found) >= count:
+            break
+    return found
+
+def main():
+    constraints, count = {}, 1
+    args = sys.argv[1:]
+    try:
+        for flag, value in zip(args[::2], args[1::2]):
+            name = flag.lstrip("-")
+            if name == "count":
+                count = int(value)
+            elif name in FIELDS:
+                constraints[FIELDS[name]] = value
+            else:
+                raise ValueError(f"unknown option {flag}")
+        if len(args) % 2 or not constraints:
+            raise ValueError("expected --field value pairs")
+        start = time.perf_counter()
+        found = 0
+        for s in search(constraints):
+            found += 1
+            print(f"{s['answers']}  seed {s['seed']:<7} ({s['odds']:.1%} of seeds for these stats)")
+            print(f"  -> {s['character']['summary'].splitlines()[0]}")
+            if found == 1:
+                print(f"  (first solution in {time.perf_counter() - start:.2f}s)", file=sys.stderr)
+            if found >= count:
+                break
+        if not found:
+            print("No answers reach that character.")
+    except ValueError as e:
+        print(f"error: {e}")
+        print("usage: reverse_search.py [--class C] [--background B] [--race R] [--alignment A]"
+              " [--subclass S] [--tone T] [--count N]")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Precomputed tables in one flat file, memory-mapped read-only by every worker.
+
+    python3 shared_tables.py build forge.tables   # build (about two seconds)
+    python3 shared_tables.py info forge.tables
+    FORGE_TABLES=forge.tables gunicorn -w 8 app:app
+
+The file holds the live class odds for every reachable quiz state (see
+outcomes.class_odds_layers) and the dense scoring tables synthesize_batch()
+uses. Arrays are read with numpy.frombuffer straight off the mapping, so
+nothing is unpickled or copied. Each worker only maps the file, which takes
+milliseconds, and the OS keeps one copy of its pages for all of them.
+
+Layout: b"FGTB", a little-endian uint32 header length, a JSON header
+({"version": ..., "arrays": {name: [dtype, shape, offset]}}), then each
+array's raw bytes, 64-byte aligned; offsets count from the first aligned
+byte after the header. The version is a digest of the questions and rules.
+A file built for other content is rebuilt by load_or_build(), or refused by
+open_tables().
+"""
+
+import hashlib, json, mmap, os, struct, sys
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: concurrent first builds just duplicate work
+    fcntl = None
+
+import numpy as np
+
+import character_generator as cg
+import outcomes as oc
+
+MAGIC = b"FGTB"
+ALIGN = 64
+BATCH_TABLES = ("offsets", "class", "background", "tone", "subclass_counts")
+
+def tables_version():
+    """Digest of everything the tables are computed from."""
+    parts = (cg.STAT_KEYS, cg.STAT_MIN, cg.STAT_MAX, cg.TIEBREAK_SPREAD, cg.CLASSES,
+             cg.BACKGROUND_NAMES, cg.QUESTIONS, cg.CLASS_RULES, cg.BACKGROUND_RULES,
+             cg.TONE_RULES, cg.TONES, [len(cg.SUBCLASS_SUGGESTIONS.get(c, [])) for c in cg.CLASSES])
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:12]
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+class SharedTables:
+    """Read-only views into a mapped tables file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != MAGIC:
+            raise ValueError(f"{path}: not a tables file")
+        (size,) = struct.unpack_from("<I", self._map, 4)
+        header = json.loads(self._map[8:8 + size])
+        start = _aligned(8 + size)
+        self.path = path
+        self.version = header["version"]
+        self.arrays = {}
+        for name, (dtype, shape, offset) in header["arrays"].items():
+            count = int(np.prod(shape))
+            self.arrays[name] = np.frombuffer(self._map, dtype=dtype, count=count,
+                                              offset=start + offset).reshape(shape)
+        self.steps = sum(1 for name in self.arrays if name.startswith("odds.states."))
+
+    def class_odds(self, step, state):
+        """Row of class probabilities for a quantized state, or None if it isn't in the table."""
+        states = self.arrays[f"odds.states.{step}"]
+        i = int(np.searchsorted(states, state))
+        if i == len(states) or states[i] != state:
+            return None
+        return self.arrays[f"odds.rows.{step}"][i]
+
+    def batch_tables(self):
+        """The dense tables in the shape character_generator._get_batch_tables() returns."""
+        return {name: self.arrays[f"batch.{name}"] for name in BATCH_TABLES}
+
+    def nbytes(self):
+        return len(self._map)
+
+def build(path):
+    """Compute every table and write them to `path` (atomically)."""
+    arrays = {}
+    for name, table in cg._get_batch_tables().items():
+        arrays[f"batch.{name}"] = table
+    for step, states, odds in oc.class_odds_layers():
+        arrays[f"odds.states.{step}"] = states.astype("<i8")
+        arrays[f"odds.rows.{step}"] = odds.astype("<f4")
+    index, offset = {}, 0
+    for name, table in arrays.items():
+        index[name] = [table.dtype.newbyteorder("<").str, list(table.shape), offset]
+        offset += _aligned(table.nbytes)
+    header = json.dumps({"version": tables_version(), "arrays": index}).encode("utf-8")
+    start = _aligned(8 + len(header))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for name, table in arrays.items():
+            f.seek(start + index[name][2])
+            f.write(np.ascontiguousarray(table, dtype=index[name][0]).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+def open_tables(path):
+    """Map `path`; ValueError if it was built for other questions or rules."""
+    tables = SharedTables(path)
+    if tables.version != tables_version():
+        raise ValueError(f"{path} is out of date: rebuild it with shared_tables.py build")
+    return tables
+
+def load_or_build(path):
+    """Map `path`, building it first if it is missing or stale.
+
+    Concurrent callers (workers starting together) wait on a lock file so
+    the tables are only built once.
+    """
+    try:
+        return open_tables(path)
+    except (OSError, ValueError):
+        pass
+    with open(path + ".lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return open_tables(path)  # another worker may have built it meanwhile
+        except (OSError, ValueError):
+            build(path)
+        return open_tables(path)
+
+def install(tables):
+    """Use the mapped scoring tables for synthesize_batch() and the outcome tools."""
+    cg._batch_tables = tables.batch_tables()
+
+def main():
+    args = sys.argv[1:]
+    if len(args) == 2 and args[0] in ("build", "info"):
+        if args[0] == "build":
+            build(args[1])
+        try:
+            tables = open_tables(args[1])
+        except (OSError, ValueError) as e:
+            print(f"error: {e}")
+            return 1
+        states = sum(len(tables.arrays[f"odds.states.{s}"]) for s in range(tables.steps))
+        print(f"{args[1]}: version {tables.version}, {tables.nbytes() / 2**20:.1f} MB, "
+              f"{states:,} quiz states over {tables.steps} steps")
+        return 0
+    print("usage: shared_tables.py build|info PATH")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
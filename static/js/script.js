@@ -1,33 +1,128 @@
-script_js = r'''// Character Forge interactions
+// Character Forge interactions
+// --- engine ---
+// The quiz rules from a bundle (see bundle.py): stats are arrays in the
+// bundle's stat order, clamped after every answer as on the server
+const ForgeEngine = {
+  start(bundle) {
+    return bundle.start.slice();
+  },
+  answer(bundle, stats, qid, choice) {
+    const opt = bundle.questions[qid].opts.find(o => o[0] === choice);
+    if (!opt) throw new Error(`question ${qid + 1} has no option ${choice}`);
+    return stats.map((v, i) => Math.min(bundle.max, Math.max(bundle.min, v + opt[2][i])));
+  },
+  // Same packing as character_generator.pack_stats; fits a double exactly
+  pack(bundle, stats) {
+    const radix = bundle.max - bundle.min + 1;
+    return stats.reduce((state, v) => state * radix + v - bundle.min, 0);
+  },
+  mask(bundle, stats) {
+    return stats.reduce((mask, v, i) => mask | bundle.stat_masks[i][v - bundle.min], 0);
+  },
+  fired(mask, clauses) {
+    return clauses.some(c => (mask & c) === c);
+  },
+  classScores(bundle, stats) {
+    const mask = this.mask(bundle, stats);
+    const scores = bundle.classes.map(() => 0);
+    for (const [clauses, weights] of bundle.class_rules) {
+      if (this.fired(mask, clauses)) weights.forEach((w, i) => { scores[i] += w; });
+    }
+    return scores;
+  },
+  tone(bundle, stats) {
+    const mask = this.mask(bundle, stats);
+    const rule = bundle.tone_rules.find(([clauses]) => this.fired(mask, clauses));
+    return rule ? rule[1] : bundle.default_tone;
+  },
+  // Classes sharing the top base score, before the tiebreak dice
+  leaning(bundle, stats) {
+    const scores = this.classScores(bundle, stats);
+    const best = Math.max(...scores);
+    return best > 0 ? bundle.classes.filter((_, i) => scores[i] === best) : [];
+  },
+};
+// --- end engine ---
+
+// Plays the whole quiz in the page, then posts the answers in one go
+function runClientQuiz(card, bundle) {
+  const progress = card.querySelector(".progress");
+  const question = card.querySelector(".question");
+  const form = card.querySelector(".choices");
+  let likely = card.querySelector(".likely");
+  if (!likely) {
+    likely = document.createElement("div");
+    likely.className = "likely";
+    progress.after(likely);
+  }
+  let stats = ForgeEngine.start(bundle), answers = "", qid = 0;
+
+  function show() {
+    const q = bundle.questions[qid];
+    progress.textContent = `Question ${qid + 1} / ${bundle.questions.length}`;
+    question.textContent = q.q;
+    form.replaceChildren(...q.opts.map(([choice, text]) => {
+      const btn = document.createElement("button");
+      btn.className = "choice-btn";
+      btn.name = "choice";
+      btn.value = choice;
+      btn.textContent = text;
+      return btn;
+    }));
+    const leaning = ForgeEngine.leaning(bundle, stats);
+    likely.textContent = leaning.length ? `Leaning toward: ${leaning.join(", ")}` : "";
+  }
+
+  form.addEventListener("submit", event => {
+    event.preventDefault();
+    const choice = event.submitter && event.submitter.value;
+    if (!choice) return;
+    stats = ForgeEngine.answer(bundle, stats, qid, choice);
+    answers += choice;
+    qid += 1;
+    if (qid < bundle.questions.length) {
+      show();
+      window.scrollTo({ top: 0, behavior: "smooth" });
+      return;
+    }
+    const finish = document.createElement("form");
+    finish.method = "post";
+    finish.action = card.dataset.finish;
+    for (const [name, value] of [["answers", answers], ["state", ForgeEngine.pack(bundle, stats)],
+                                 ["bundle", bundle.version]]) {
+      const input = document.createElement("input");
+      input.type = "hidden";
+      input.name = name;
+      input.value = value;
+      finish.append(input);
+    }
+    document.body.append(finish);
+    finish.submit();
+  });
+  show();
+}
+
 document.addEventListener("DOMContentLoaded", function() {
   // Animate buttons
-  const buttons = document.querySelectorAll(".choice-btn");
-  buttons.forEach(btn => {
-    btn.addEventListener("click", () => {
-      btn.classList.add("pressed");
-      setTimeout(() => btn.classList.remove("pressed"), 200);
-    });
+  document.addEventListener("click", event => {
+    const btn = event.target.closest(".choice-btn");
+    if (!btn) return;
+    btn.classList.add("pressed");
+    setTimeout(() => btn.classList.remove("pressed"), 200);
   });
 
   // Add smooth scroll on transitions
   document.querySelectorAll("form").forEach(f => {
     f.addEventListener("submit", () => window.scrollTo({ top: 0, behavior: "smooth" }));
   });
-});
-'''
-
-with open(os.path.join(ROOT, "static", "js", "script.js"), "w", encoding="utf-8") as f:
-    f.write(script_js)
 
-# --- Placeholder portrait (SVG) ---
-portrait_svg = r'''<svg xmlns="http://www.w3.org/2000/svg" width="480" height="640" viewBox="0 0 480 640">
-<rect width="100%" height="100%" fill="#efe6d9"/>
-<g transform="translate(40,40)">
-  <rect width="400" height="560" rx="12" fill="#fffaf0" stroke="#e1d6c4" />
-  <text x="200" y="300" font-family="Cinzel, serif" font-size="28" text-anchor="middle" fill="#7a3b1b">Portrait</text>
-  <text x="200" y="340" font-family="EB Garamond, serif" font-size="14" text-anchor="middle" fill="#6b5a4a">Replace with race_class art</text>
-</g>
-</svg>'''
-
-with open(os.path.join(ROOT, "static", "img", "portrait_placeholder.png"), "wb") as f:
-    f.write(portrait_svg.encode("utf-8"))
\ No newline at end of file
+  // From the first question on, run the quiz locally if the bundle loads;
+  // otherwise every answer keeps going through the server
+  const card = document.querySelector(".quiz-card[data-bundle]");
+  if (card && card.dataset.qid === "0" && window.fetch) {
+    fetch(card.dataset.bundle)
+      .then(response => response.ok ? response.json() : Promise.reject(response.status))
+      .then(bundle => runClientQuiz(card, bundle))
+      .catch(() => {});
+  }
+});
@@ -0,0 +1,59 @@
+import os
+
+os.environ.setdefault("FORGE_PREDICTIONS", "0")
+
+import pytest
+
+import app as web
+import banks
+import bundle
+import character_generator as cg
+
+
+@pytest.fixture
+def client():
+    web.app.config["TESTING"] = True
+    with web.app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def fresh_pages():
+    web._quiz_pages.clear()
+    web._bundles.clear()
+    yield
+    web._quiz_pages.clear()
+    web._bundles.clear()
+
+
+def test_too_many_features_falls_back_to_server_quiz(client, fresh_pages, monkeypatch):
+    # One threshold per stat and value, as far as tuned rules could go
+    rules = [([{k: n}], {}) for k in cg.STAT_KEYS for n in range(1, 8)]
+    monkeypatch.setattr(cg, "FEATURES", cg._rule_features(rules))
+    assert len(cg.FEATURES) > 31
+    with pytest.raises(ValueError):
+        bundle.build_bundle()
+
+    page = client.get("/quiz/0")
+    assert page.status_code == 200
+    assert b"data-bundle" not in page.data
+    assert b'class="choice-btn"' in page.data
+    assert client.get("/bundle/anything.json").status_code == 404
+
+
+def test_pages_and_css_are_plain(client):
+    css = client.get("/static/" + web.ASSETS["css/style.css"].fingerprinted)
+    for body in (client.get("/").data, client.get("/quiz/0").data, css.data):
+        assert b"r'''" not in body
+        assert b"f.write" not in body
+        assert b"os.makedirs" not in body
+
+
+def test_permalink_page_is_plain(client):
+    cid = cg.character_id(cg.unpack_stats(cg.START_STATE), 7, banks.BUILTIN.version)
+    page = client.get(f"/c/{cid}")
+    assert page.status_code == 200
+    assert page.headers["ETag"] == f'"{cid}.{web.RESULT_TEMPLATE_VERSION}"'
+    assert b"r'''" not in page.data
+    assert b"f.write" not in page.data
+    assert b"result-card" in page.data
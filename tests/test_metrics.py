@@ -0,0 +1,62 @@
+import asyncio
+import os
+
+os.environ.setdefault("FORGE_PREDICTIONS", "0")
+
+from flask import Flask, render_template_string
+
+import asgi
+import banks
+import character_generator as cg
+import metrics
+
+
+def test_histogram_counts_pending_values_on_scrape():
+    hist = metrics.Histogram((0.001, 0.01))
+    for value in (0.0005, 0.005, 0.005, 1.0):
+        hist.observe(value)
+    lines = hist.samples("t", ())
+    assert lines[:3] == ['t_bucket{le="0.001"} 1', 't_bucket{le="0.01"} 3', 't_bucket{le="+Inf"} 4']
+    assert lines[-1] == "t_count 4"
+
+
+def test_instrument_times_requests_and_renders():
+    app = Flask(__name__)
+
+    @app.route("/hello")
+    def hello():
+        return render_template_string("hi {{ name }}", name="there")
+
+    registry = metrics.Registry()
+    try:
+        metrics.instrument(app, registry)
+        client = app.test_client()
+        assert client.get("/hello").data == b"hi there"
+        text = client.get("/metrics").text
+    finally:
+        cg.phase_timer = None
+    assert 'forge_request_seconds_count{route="hello"} 1' in text
+    assert "forge_render_seconds_count" in text
+    assert 'forge_session_seconds_count{op="open"}' in text
+
+
+def test_asgi_permalinks_are_recorded():
+    registry = metrics.Registry()
+    forge = asgi.ForgeASGI()
+    forge.timer = metrics.TimedWSGI(Flask(__name__), registry)
+    cid = cg.character_id(cg.unpack_stats(cg.START_STATE), 7, banks.BUILTIN.version)
+    scope = {"type": "http", "method": "GET", "path": f"/c/{cid}", "query_string": b"",
+             "headers": [(b"cookie", b"session=abc")]}
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    asyncio.run(forge(scope, receive, send))
+    assert sent[0]["status"] == 200
+    text = registry.render()
+    assert 'forge_request_seconds_count{route="character"} 1' in text
+    assert 'forge_session_bytes_bucket{le="32"} 1' in text
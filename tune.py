@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Tune the class and background rules toward a target mix of outcomes.
+
+    python3 tune.py                                    # every class and background equally likely
+    python3 tune.py --target target.json --method random --evals 4000 --workers 4
+    FORGE_RULES=tuned_rules.json python3 app.py        # play with the result
+
+The search moves the weights (0..MAX_WEIGHT) and thresholds
+(1..MAX_THRESHOLD) of the existing CLASS_RULES and BACKGROUND_RULES; which
+classes a rule bumps and the tiebreak dice stay as they are. Every
+candidate is scored on its exact class and background odds over all
+answer paths (see outcomes.py), as the total variation distance from the
+target.
+
+That is cheap enough for thousands of candidates because the answer space
+is walked once: the final states, exact up to MAX_THRESHOLD, with their
+path counts. A set of rule conditions then only decides which rules fire
+in each state, and the counts per firing pattern (at most 2 ** rules) are
+cached, so a candidate that only changes weights never looks at the
+states again. Candidates are scored in parallel on a process pool.
+
+--target is JSON like {"class": {"Wizard": 2}, "background": {"Noble": 0.5}}:
+relative weights, 1 for anything left out. The tuned rules go to --out
+(tuned_rules.json) together with the odds they give; the report compares
+the odds before and after.
+"""
+
+import copy, json, random, sys, time
+from functools import lru_cache
+from multiprocessing import Pool
+
+import numpy as np
+
+import character_generator as cg
+import cli
+import outcomes as oc
+
+MAX_WEIGHT = 5
+MAX_THRESHOLD = 4  # higher ones need the answer space kept exact further up (memory)
+_STAT_INDEX = {k: i for i, k in enumerate(cg.STAT_KEYS)}
+
+# --- The answer space ---
+
+def answer_space():
+    """(stat columns, path counts) for every final state, exact up to MAX_THRESHOLD."""
+    states, counts = oc.run_from(*oc.start_distribution(MAX_THRESHOLD), 0, ceiling=MAX_THRESHOLD)
+    columns = [((states // stride) % cg.STAT_RADIX + cg.STAT_MIN).astype(np.int8) for stride in oc._STRIDES]
+    return columns, counts.astype(np.float64)
+
+_space = None
+
+def _init(columns, counts):
+    global _space
+    _space = columns, counts
+    _patterns.clear()
+    pattern_counts.cache_clear()
+
+def _fired(clauses):
+    columns, counts = _space
+    fired = np.zeros(len(counts), dtype=bool)
+    for clause in clauses:
+        hit = np.ones(len(counts), dtype=bool)
+        for k, n in clause:
+            hit &= columns[_STAT_INDEX[k]] >= n
+        fired |= hit
+    return fired
+
+_PATTERNS_KEPT = 4
+_patterns = {}  # conditions -> firing pattern of every state, least recently used first
+
+def state_patterns(conditions):
+    """Firing pattern (bit r: rule r fired) of every state for a tuple of rule conditions.
+
+    Starts from the kept pattern sharing the most rules, so a candidate that
+    moves one threshold only redoes that rule.
+    """
+    same_size = [seen for seen in _patterns if len(seen) == len(conditions)]
+    near = min(same_size, key=lambda seen: sum(a != b for a, b in zip(seen, conditions)), default=None)
+    if near is None:
+        pattern, redo = np.zeros(len(_space[1]), dtype=np.int32), range(len(conditions))
+    else:
+        pattern = _patterns.pop(near)
+        _patterns[near] = pattern  # most recently used again
+        pattern = pattern.copy()
+        redo = [r for r, (a, b) in enumerate(zip(near, conditions)) if a != b]
+    for r in redo:
+        pattern &= ~(1 << r)
+        pattern |= _fired(conditions[r]).astype(np.int32) << r
+    _patterns[conditions] = pattern
+    while len(_patterns) > _PATTERNS_KEPT:
+        del _patterns[next(iter(_patterns))]
+    return pattern
+
+@lru_cache(maxsize=1024)
+def pattern_counts(conditions):
+    """Path counts per firing pattern for a tuple of rule conditions."""
+    return np.bincount(state_patterns(conditions), weights=_space[1], minlength=1 << len(conditions))
+
+def _conditions_key(rules):
+    return tuple(tuple(tuple(sorted(clause.items())) for clause in conditions) for conditions, _ in rules)
+
+def odds(rules, names):
+    """Exact {name: probability} for a rule list, tiebreak included."""
+    weights = pattern_counts(_conditions_key(rules))
+    patterns = np.flatnonzero(weights)
+    fired = (patterns[:, None] >> np.arange(len(rules))) & 1
+    base = fired @ np.array([[w.get(n, 0) for n in names] for _, w in rules], dtype=np.int64)
+    rows, inverse = oc.unique_rows(base)
+    wins = oc.tiebreak_table(rows)[inverse]
+    p = weights[patterns] @ wins / (weights.sum() * cg.TIEBREAK_SPREAD ** len(names))
+    return dict(zip(names, p.tolist()))
+
+def distance(p, target):
+    return sum(abs(p[n] - target[n]) for n in target) / 2
+
+def score(candidate, target):
+    """(loss, {"class": odds, "background": odds}) for a {"class_rules", "background_rules"} dict."""
+    dist = {"class": odds(candidate["class_rules"], cg.CLASSES),
+            "background": odds(candidate["background_rules"], cg.BACKGROUND_NAMES)}
+    return distance(dist["class"], target["class"]) + distance(dist["background"], target["background"]), dist
+
+def _score_job(args):
+    return score(*args)[0]
+
+# --- Search ---
+
+def coordinates(rules):
+    """(key, rule, field) for everything the search may change, with field
+    ("w", name) for a weight or ("t", clause, stat) for a threshold."""
+    coords = []
+    for key in ("class_rules", "background_rules"):
+        for r, (conditions, weights) in enumerate(rules[key]):
+            coords += [(key, r, ("w", name)) for name in weights]
+            coords += [(key, r, ("t", c, k)) for c, clause in enumerate(conditions) for k in clause]
+    return coords
+
+def choices(coord):
+    return range(0, MAX_WEIGHT + 1) if coord[2][0] == "w" else range(1, MAX_THRESHOLD + 1)
+
+def get(rules, coord):
+    key, r, field = coord
+    conditions, weights = rules[key][r]
+    return weights[field[1]] if field[0] == "w" else conditions[field[1]][field[2]]
+
+def with_value(rules, coord, value):
+    rules = copy.deepcopy(rules)
+    key, r, field = coord
+    conditions, weights = rules[key][r]
+    if field[0] == "w":
+        weights[field[1]] = value
+    else:
+        conditions[field[1]][field[2]] = value
+    return rules
+
+def coordinate_descent(start, evaluate, evals, rng):
+    """Try every value of one coordinate at a time, keeping the best, until a pass changes nothing."""
+    best, best_loss = start, evaluate([start])[0]
+    used, improved = 1, True
+    coords = coordinates(start)
+    while improved and used < evals:
+        improved = False
+        rng.shuffle(coords)
+        for coord in coords:
+            candidates = [with_value(best, coord, v) for v in choices(coord) if v != get(best, coord)]
+            candidates = candidates[:evals - used]
+            if not candidates:
+                break
+            losses = evaluate(candidates)
+            used += len(candidates)
+            i = min(range(len(losses)), key=losses.__getitem__)
+            if losses[i] < best_loss - 1e-12:
+                best, best_loss, improved = candidates[i], losses[i], True
+    return best, best_loss, used
+
+def random_search(start, evaluate, evals, rng, batch=64):
+    """Score batches of random 1-3 coordinate moves from the best so far; keep any improvement."""
+    best, best_loss = start, evaluate([start])[0]
+    used = 1
+    coords = coordinates(start)
+    while used < evals:
+        candidates = []
+        for _ in range(min(batch, evals - used)):
+            candidate = best
+            for coord in rng.sample(coords, rng.randint(1, 3)):
+                candidate = with_value(candidate, coord, rng.choice(choices(coord)))
+            candidates.append(candidate)
+        losses = evaluate(candidates)
+        used += len(candidates)
+        i = min(range(len(losses)), key=losses.__getitem__)
+        if losses[i] < best_loss:
+            best, best_loss = candidates[i], losses[i]
+    return best, best_loss, used
+
+METHODS = {"descent": coordinate_descent, "random": random_search}
+
+def tune(target, method="descent", evals=2000, workers=1, seed=0):
+    """(tuned rules, before odds, after odds, evaluations used)."""
+    start = {"class_rules": copy.deepcopy(cg.CLASS_RULES), "background_rules": copy.deepcopy(cg.BACKGROUND_RULES)}
+    space = answer_space()
+    _init(*space)
+    pool = Pool(workers, _init, space) if workers > 1 else None
+    try:
+        def evaluate(candidates):
+            jobs = [(c, target) for c in candidates]
+            return pool.map(_score_job, jobs) if pool else [_score_job(job) for job in jobs]
+        best, _, used = METHODS[method](start, evaluate, evals, random.Random(seed))
+    finally:
+        if pool:
+            pool.close()
+    return best, score(start, target)[1], score(best, target)[1], used
+
+def read_target(path=None):
+    """Target probabilities from relative weights; everything defaults to 1."""
+    given = {}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            given = json.load(f)
+    target = {}
+    for section, names in (("class", cg.CLASSES), ("background", cg.BACKGROUND_NAMES)):
+        weights = given.get(section, {})
+        unknown = set(weights) - set(names)
+        if unknown:
+            raise ValueError(f"unknown {section} in target: {', '.join(sorted(unknown))}")
+        raw = {n: float(weights.get(n, 1)) for n in names}
+        total = sum(raw.values())
+        if total <= 0 or min(raw.values()) < 0:
+            raise ValueError(f"{section} target weights must be non-negative and not all zero")
+        target[section] = {n: w / total for n, w in raw.items()}
+    return target
+
+def print_report(target, before, after):
+    for section in ("class", "background"):
+        print(f"\n{section.title()} odds      target    before     after")
+        print("-" * 46)
+        for name, p in sorted(after[section].items(), key=lambda x: -x[1]):
+            print(f"  {name:16} {target[section][name]:8.2%}  {before[section][name]:8.2%}  {p:8.2%}")
+        print(f"  {'distance':16} {'':8}  {distance(before[section], target[section]):8.4f}  "
+              f"{distance(after[section], target[section]):8.4f}")
+    print()
+
+def rules_json(rules, odds, target):
+    """The rules file: one rule per line so it reads (and diffs) like the source."""
+    parts = []
+    for key in ("class_rules", "background_rules"):
+        lines = ",\n".join(f"    {json.dumps([conditions, weights])}" for conditions, weights in rules[key])
+        parts.append(f'  "{key}": [\n{lines}\n  ]')
+    for key, value in (("odds", odds), ("target", target)):
+        parts.append(f'  "{key}": {json.dumps(value)}')
+    return "{\n" + ",\n".join(parts) + "\n}\n"
+
+def main():
+    try:
+        method = cli.flag("--method", "descent", choices=METHODS)
+        evals, workers = cli.flag("--evals", 2000, int), cli.flag("--workers", 1, int)
+        seed = cli.flag("--seed", 0, int)
+        target = read_target(cli.flag("--target"))
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        print("usage: tune.py [--target FILE] [--method descent|random] [--evals N] [--workers N]"
+              " [--seed S] [--out FILE]", file=sys.stderr)
+        return 1
+    out = cli.flag("--out", "tuned_rules.json")
+    start = time.perf_counter()
+    rules, before, after, used = tune(target, method, evals, workers, seed)
+    elapsed = time.perf_counter() - start
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(rules_json(rules, after, target))
+    print_report(target, before, after)
+    print(f"{used} candidates scored in {elapsed:.1f}s; rules written to {out} "
+          f"(load them with FORGE_RULES={out})", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())